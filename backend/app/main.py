@@ -1,26 +1,142 @@
 # backend/app/main.py
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_google_genai import ChatGoogleGenerativeAI
-from typing import Dict
-from langchain_core.output_parsers import PydanticOutputParser,StrOutputParser
-from langchain.schema.runnable import RunnableBranch, RunnableLambda
+from pydantic import BaseModel, Field, model_validator
+from typing import Dict, Literal, Optional
 import datetime
 from dotenv import load_dotenv
-from langchain_core.prompts import MessagesPlaceholder
-from fastapi.responses import JSONResponse
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from fastapi.responses import JSONResponse, StreamingResponse
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, AIMessageChunk
+from langchain_core.runnables import RunnableBranch, RunnableGenerator, RunnableLambda
+import asyncio
 import json
-import traceback
-from groq import Groq
-from langchain_groq import ChatGroq
+import hashlib
+import time
 import os
+from contextlib import asynccontextmanager
+from app.services.admission import BACKGROUND, HINT, AdmissionControl, AdmissionMiddleware, Overloaded, priority, request_priority
+from app.services.code_classifier import CodeRelevanceClassifier
+from app.services.code_diff import CodeDiffer, CodeOutOfSync, apply_edit, code_hash
+from app.services.context_packing import ContextPacker, count_tokens, prompt_tokens
+from app.services.hint_cache import HintCache
+from app.services.hint_parsing import HintParseError, missing_levels, parse_batch_hints, parse_hints
+from app.services.model_registry import ModelRegistry
+from app.services.prompts import prompts
+from app.services.provider_router import HealthBoard, ProviderRouter
+from app.services.replay import replay_log
+from app.services.serialization import CompressionMiddleware, FastJSONResponse, FastJSONRoute, etag, etag_matches
+from app.services.semantic_cache import SemanticCache
+from app.services.session_store import SessionStore
+from app.services.shared_state import SharedState
+from app.services.singleflight import SingleFlight
+from app.services.streaming import extract_hint_levels, ndjson, sse
+from app.services.telemetry import RequestMetricsMiddleware, logger, setup_logging, telemetry
+from app.services.tiering import TieringPolicy, with_max_tokens
 
 load_dotenv()
+setup_logging(os.getenv("LOG_LEVEL", "INFO"))
 
-app = FastAPI(title="LeetCode AI Assistant API", version="1.0.0")
+HINT_MODEL = "gemini-1.5-flash"
+HINT_PROMPT_VERSION = prompts.version("hint")
+HINT_LEVEL_PROMPT_VERSION = prompts.version("hint_missing")
+
+# sessions, rate limits and single-flight locks are shared between workers
+# when SHARED_STATE_URL points at Redis
+shared_state = SharedState.from_env()
+hint_cache = HintCache.from_env()
+models = ModelRegistry.from_env()
+code_classifier = CodeRelevanceClassifier.from_env()
+sessions = SessionStore.from_env(shared_state)
+hint_flight = SingleFlight.from_env(shared_state.redis_url)
+semantic_cache = SemanticCache.from_env()
+code_differ = CodeDiffer.from_env()
+
+# retries are left to the provider router, which fails over instead
+EXPLAIN_GROQ = ("groq", "llama-3.1-8b-instant", dict(temperature=0.3, max_tokens=600, timeout=30, max_retries=0))
+EXPLAIN_GEMINI = ("google", "gemini-1.5-flash", dict(temperature=0.3, max_output_tokens=600, timeout=30, max_retries=0))
+# thinking off: on 2.5 models thinking tokens count against max_output_tokens
+EXPLAIN_GEMINI_25 = ("google", "gemini-2.5-flash", dict(temperature=0.3, max_output_tokens=600, timeout=30, max_retries=0,
+                                                        thinking_budget=0))
+# hints use the providers' native JSON output mode
+HINT_GEMINI = ("google", HINT_MODEL, dict(temperature=0, max_output_tokens=2012, timeout=60, max_retries=0,
+                                         response_mime_type="application/json"))
+HINT_GEMINI_25 = ("google", "gemini-2.5-flash", dict(temperature=0, max_output_tokens=2012, timeout=60, max_retries=0,
+                                                     response_mime_type="application/json", thinking_budget=0))
+HINT_GROQ = ("groq", "llama-3.1-8b-instant", dict(temperature=0, max_tokens=2012, timeout=60, max_retries=0,
+                                                  model_kwargs={"response_format": {"type": "json_object"}}))
+
+
+HINT_PREFETCH = os.getenv("HINT_PREFETCH", "1") == "1"
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "10"))
+# /api/hint/batch: problems per request, per multi-problem prompt, and prompts in flight
+HINT_BATCH_MAX = int(os.getenv("HINT_BATCH_MAX", "100"))
+HINT_BATCH_GROUP = int(os.getenv("HINT_BATCH_GROUP", "4"))
+HINT_BATCH_CONCURRENCY = int(os.getenv("HINT_BATCH_CONCURRENCY", "4"))
+
+provider_health = HealthBoard.from_env()
+admission = AdmissionControl.from_env(shared_state)
+ROUTER_HEDGE = os.getenv("ROUTER_HEDGE", "1") == "1"
+explain_model = ProviderRouter(models, [EXPLAIN_GROQ, EXPLAIN_GEMINI, EXPLAIN_GEMINI_25], provider_health,
+                               hedge=ROUTER_HEDGE, admission=admission)
+hint_model = ProviderRouter(models, [HINT_GEMINI, HINT_GEMINI_25, HINT_GROQ], provider_health,
+                            hedge=ROUTER_HEDGE, admission=admission)
+# each call picks a tier: a failover order over the family's routes and an output cap
+tiering = TieringPolicy.from_env({"explain": explain_model, "hint": hint_model})
+# room for four levels per problem in a multi-problem answer
+hint_batch_model = ProviderRouter(
+   models,
+   [with_max_tokens(route, min(8192, 700 * HINT_BATCH_GROUP)) for route in hint_model.routes],
+   provider_health,
+   hedge=ROUTER_HEDGE,
+   admission=admission,
+)
+
+context_packer = ContextPacker.from_env()
+EXPLAIN_BUDGET = context_packer.budget_for(explain_model.routes)
+HINT_BUDGET = context_packer.budget_for(hint_model.routes)
+
+
+warmup_state = {"done": False, "seconds": None}
+
+
+async def warm_up():
+   """Import the provider SDKs, build every route's client and connect the hint cache off the event loop"""
+   start = time.monotonic()
+   routes = explain_model.routes + hint_model.routes + tiering.routes() + hint_batch_model.routes
+   await asyncio.to_thread(models.warm, routes)
+   try:
+      await asyncio.to_thread(hint_cache.connect)
+   except Exception as e:
+      logger.warning("Hint cache backend unavailable: %s", e)
+   warmup_state.update(done=True, seconds=round(time.monotonic() - start, 3))
+   logger.info("Model clients warmed in %.2fs", warmup_state["seconds"])
+
+
+@asynccontextmanager
+async def lifespan(app):
+   # the server starts answering /health at once; /ready reports when the
+   # models are warm so a load balancer only routes traffic after that
+   warmup_task = asyncio.create_task(warm_up())
+   try:
+      await shared_state.ping()
+   except Exception as e:
+      logger.error("Shared state at %s is unreachable: %s", shared_state.url, e)
+   yield
+   if not warmup_task.done():
+      warmup_task.cancel()
+   # the server has stopped accepting and finished in-flight requests
+   await drain_prefetches(SHUTDOWN_DRAIN_TIMEOUT)
+   await models.aclose()
+   await shared_state.aclose()
+
+
+app = FastAPI(title="LeetCode AI Assistant API", version="1.0.0", lifespan=lifespan,
+              default_response_class=FastJSONResponse)
+# JSON bodies are decoded with orjson when it is installed
+app.router.route_class = FastJSONRoute
+
+# per-client rate limit; inside CORS so 429s still carry the CORS headers
+app.add_middleware(AdmissionMiddleware, admission=admission)
 
 # CORS middleware for Chrome extension
 app.add_middleware(
@@ -30,6 +146,8 @@ app.add_middleware(
    allow_methods=["*"],
    allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESS_MIN_SIZE", "1000")))
+app.add_middleware(RequestMetricsMiddleware, telemetry=telemetry)
 
 
 class ProblemData(BaseModel):
@@ -40,16 +158,55 @@ class ProblemData(BaseModel):
 
 class HintRequest(BaseModel):
    problem_data:ProblemData
-   hint_level:int=1 #level 1,2,3,4,5
+   hint_level:int=1 #level 1,2,3,4,5; only read in "level" mode, where it must be 1-4
+   mode:Literal["all","level"]="all" # "level": only generate hints up to hint_level
+
+   @model_validator(mode="after")
+   def check_level(self):
+      if self.mode == "level" and not 1 <= self.hint_level <= 4:
+         raise ValueError("hint_level must be 1-4 in level mode")
+      return self
+
+class HintBatchRequest(BaseModel):
+   problems:list[ProblemData]=Field(..., min_length=1, max_length=HINT_BATCH_MAX)
+
+class CodeEdit(BaseModel):
+   # replace lines start:end of the session's code (hash base_hash) with lines
+   base_hash:str
+   start:int=Field(..., ge=0)
+   end:int=Field(..., ge=0)
+   lines:list[str]
+
+class ChatMessage(BaseModel):
+   # the extension also sends id and timestamp, which are ignored
+   sender:Literal["user","ai","system"]
+   text:str
 
 class explainRequest(BaseModel):
-   chat:list[object]
-   problem:str
-   code:str
+   chat:Optional[list[ChatMessage]]=None # full transcript, or earlier turns when seeding a new session
+   problem:Optional[str]=None
+   code:Optional[str]=None
+   code_hash:Optional[str]=None # session mode: sha256 of the editor contents, alone when they are unchanged
+   code_edit:Optional[CodeEdit]=None # session mode: the change since the code the session holds
+   session_id:Optional[str]=None
+   problem_id:Optional[str]=None
+   message:Optional[str]=None # new user message; switches to server-side session history
+
+   @model_validator(mode="after")
+   def check_shape(self):
+      if self.message is None:
+         # transcript mode: the last user/ai entry of chat is the question
+         if self.problem is None:
+            raise ValueError("problem is required without message")
+         if not any(msg.sender in ("user", "ai") for msg in self.chat or []):
+            raise ValueError("chat needs a user or ai message when message is not given")
+      elif self.session_id is None and self.problem is None:
+         raise ValueError("problem is required to start a session")
+      return self
 
 
 class HintResponse(BaseModel):
-   hint:dict
+   hint:Dict[int,str]
    problem_title:str
    timestamp:str
 
@@ -59,9 +216,11 @@ class ExplainRequest(BaseModel):
 
 class ExplainResponse(BaseModel):
    explanation:str
+   session_id:Optional[str]=None
 
 class MultiLevelHint(BaseModel):
    problem_title:str
+   # int levels; "1".."4" keys from the model or a JSON cache backend are coerced
    hints:Dict[int,str]=Field(..., description="Hints for level 1-4, keys are 1,2,3,4")
 
 @app.get("/")
@@ -72,183 +231,697 @@ def root():
 def health_check():
    return {"status": "healthy", "version": "1.0.0"}
 
-@app.post("/api/explain")
-async def explain_que(request:explainRequest):
-    try:
-        chat = request.chat
-        problem = request.problem
-        code = request.code
-        print(problem)
-        chat_history = []
-        for msg in chat:
-            if msg['sender'] == "ai":
-                chat_history.append(AIMessage(content=msg['text']))
-            elif msg['sender'] == "user":
-                chat_history.append(HumanMessage(content=msg['text']))
-        print("chat hist", chat_history)
-        # Try LangChain Groq (Llama-3.1-8b-instant)
-        try:
-            model = ChatGroq(
-                model="llama-3.1-8b-instant",
-                api_key=os.getenv("GROQ_API_KEY"),
-                temperature=0.3,
-                max_tokens=600,
-                timeout=60,
-                max_retries=2,
-            )
-            print("using groq")
-        except Exception as groq_e:
-            print("Groq failed, falling back to Google Gemini:", groq_e)
-            # Fallback to Google Gemini
-            model = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash",
-                temperature=0.3,
-                max_output_tokens=600,
-                timeout=60,
-                max_retries=2,
-            )
-         
+@app.get("/ready")
+async def readiness():
+   try:
+      await asyncio.wait_for(shared_state.ping(), 1)
+   except Exception:
+      return JSONResponse(status_code=503, content={"status": "shared state unreachable"})
+   if not warmup_state["done"]:
+      return JSONResponse(status_code=503, content={"status": "warming"})
+   return {"status": "ready", "warmup_seconds": warmup_state["seconds"]}
+
+@app.get("/api/stats")
+async def stats():
+   return {
+      "pid": os.getpid(),
+      "sessions": await sessions.size(),
+      "semantic_cache": {"hits": semantic_cache.hits, "misses": semantic_cache.misses, "entries": len(semantic_cache)},
+      "hint_flight": {"leaders": hint_flight.leaders, "shared": hint_flight.shared},
+      "hint_prefetch": dict(hint_prefetch_stats),
+      "hint_batch": dict(hint_batch_stats),
+      "code_diff": dict(code_differ.stats),
+      "admission": admission.snapshot(),
+      "providers": provider_health.snapshot(),
+      "tiers": tiering.snapshot(),
+      "replay": replay_log.snapshot(),
+      "code_classifier": code_classifier.stats.snapshot(),
+      "hint_cache": {"hits": hint_cache.hits, "misses": hint_cache.misses, "lru_size": len(hint_cache.lru)},
+   }
+
+
+def service_gauges():
+   """The /api/stats counters as Prometheus gauges"""
+   for cache, c in (("hint", hint_cache), ("semantic", semantic_cache)):
+      yield "llm_cache_hits", {"cache": cache}, c.hits
+      yield "llm_cache_misses", {"cache": cache}, c.misses
+   yield "llm_hint_flight_shared", {}, hint_flight.shared
+   for outcome, count in hint_prefetch_stats.items():
+      yield "llm_hint_prefetch", {"outcome": outcome}, count
+   for outcome, count in hint_batch_stats.items():
+      yield "llm_hint_batch_problems", {"outcome": outcome}, count
+   for mode in ("full", "diff", "unchanged"):
+      yield "llm_code_turns", {"mode": mode}, code_differ.stats[mode]
+   yield "llm_code_tokens_saved", {}, code_differ.stats["tokens_saved"]
+   yield "llm_admission_rejected", {}, admission.rejected
+   for provider, limiter in admission.snapshot()["providers"].items():
+      for key, value in limiter.items():
+         yield f"llm_admission_{key}", {"provider": provider}, value
+   for tier, tier_stats in tiering.snapshot().items():
+      yield "llm_router_hedges", {"router": tier}, tier_stats.get("hedges", 0)
+   for name, health in provider_health.snapshot().items():
+      yield "llm_provider_breaker_open", {"route": name}, int(health["state"] != "closed")
+      yield "llm_provider_error_rate", {"route": name}, health["error_rate"]
+   for decision, count in code_classifier.stats.snapshot().items():
+      if decision not in ("total", "fallback_rate"):
+         yield "llm_precheck_decisions", {"decision": decision}, count
+
+
+telemetry.add_gauges(service_gauges)
 
+
+@app.get("/metrics")
+def metrics():
+   body, content_type = telemetry.render()
+   return Response(content=body, headers={"Content-Type": content_type})
+
+
+class SessionNotFound(Exception):
+    pass
+
+
+def overloaded_response(e):
+    return JSONResponse(
+        status_code=429,
+        content={"error": "Overloaded, please retry", "retry_after": e.retry_after},
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+async def load_chat(request):
+    """Return (problem, code, chat_history, question, session) for an explain request.
+
+    Without ``message`` the request carries the whole transcript and the last
+    entry is the question. With ``message`` the history comes from the server
+    session, which is created (and seeded from ``chat``) when it is missing.
+    """
+    if request.message is None:
+        chat_history = []
+        for msg in request.chat:
+            if msg.sender == "ai":
+                chat_history.append(AIMessage(content=msg.text))
+            elif msg.sender == "user":
+                chat_history.append(HumanMessage(content=msg.text))
         que = chat_history.pop()
-        question = que.content
-        
-        prompt_with_code = ChatPromptTemplate([
-            ('system', """You are a helpful coding assistant. 
-            For greetings, reply briefly and friendly. 
-            For coding questions, provide clear explanations. 
-            Analyze the provided code and give detailed feedback.
-            
-            Problem Context: {problem}"""),
-            MessagesPlaceholder(variable_name='chat_history',optional=True),
-            ('human', 'Question: {question}\n\nCode to analyze:\n{code}')
-        ])
-        
-        prompt_without_code = ChatPromptTemplate([
-            ('system', """You are a helpful coding assistant. 
-            For greetings, reply briefly and friendly. 
-            For coding questions, provide clear explanations. 
-            Keep responses concise unless detailed help is requested.
-            
-            Problem Context: {problem}"""),
-            MessagesPlaceholder(variable_name='chat_history'),
-            ('human', '{question}')
-        ])
-        #pre check
-        precheck_prompt=ChatPromptTemplate([
-           ('system',"""You are a strict binary classifier.
-               Task: Decide if answering the user’s question requires analyzing the user’s code.
-               Rules:
-               - Output only `1` if the question asks for debugging, fixing, improving, or explaining code.
-               - Output only `0` if the question is general (e.g., greetings, casual chat, theory, definitions, or anything not directly about the code).
-               Answer format: Return only a single character: `1` or `0`. No explanation.
-               """),
-           ('human','{question}')
-        ])
-        def process_with_code(inputs):
-            return prompt_with_code.invoke({
-                "problem": inputs["problem"],
-                "chat_history": inputs["chat_history"],
-                "question": inputs["question"],
-                "code": inputs["code"]
-            })
-        
-        def process_without_code(inputs):
-            return prompt_without_code.invoke({
-                "problem": inputs["problem"],
-                "chat_history": inputs["chat_history"],
-                "question": inputs["question"]
-            })
-        
-
-        def needs_code_check(inputs):
-            precheck_result=(precheck_prompt| model).invoke({"question":inputs['question']})
-            needs_code=str(precheck_result.content).strip()
-            print(f"Pre-check result: '{needs_code}'")
-            return needs_code == "1"
-        
-        branch_chain=RunnableBranch(
-            (needs_code_check,RunnableLambda(process_with_code) | model),
-            RunnableLambda(process_without_code) | model
-        )           
-        inputs={
-            "problem": problem,
-            "chat_history": chat_history,
-            "question": question,
-            "code": code
-         }
-        result = branch_chain.invoke(inputs)
-        print("Final resp", result)
-        print("Final resp content", result.content)
-        return ExplainResponse(explanation=result.content)
+        return request.problem, request.code or "", chat_history, que.content, None
+
+    session = await sessions.get(request.session_id) if request.session_id else None
+    if session is None:
+        if request.problem is None:
+            raise SessionNotFound(request.session_id)
+        session = sessions.create(request.problem, request.code or "")
+        session.problem_id = request.problem_id
+        for msg in request.chat or []:
+            if msg.sender in ("ai", "user"):
+                session.add(msg.sender, msg.text)
+    session.code = session_code(session, request)
+    # saved with the new turn once the answer is complete
+    chat_history = session.history(sessions.history_tokens)
+    return session.problem, session.code, chat_history, request.message, session
+
+
+def session_code(session, request):
+    """The editor contents for this turn, from full code, an edit or an unchanged hash."""
+    code = session.code
+    if request.code is not None:
+        code = request.code
+    elif request.code_edit is not None:
+        edit = request.code_edit
+        if edit.base_hash != code_hash(code):
+            raise CodeOutOfSync("Edit base does not match the session's code")
+        code = apply_edit(code, edit.start, edit.end, edit.lines)
+    if request.code_hash is not None and request.code_hash != code_hash(code):
+        raise CodeOutOfSync("Code hash does not match the session's code")
+    return code
+
+
+def code_out_of_sync_response(session_id):
+    return JSONResponse(status_code=409, content={"error": "Code out of sync, send the full code", "session_id": session_id})
+
+
+async def save_turn(session, question, answer, inputs):
+    session.add("user", question)
+    session.add("ai", answer)
+    if inputs.get("used_code"):
+        code_differ.record(inputs["code_mode"], session.code, inputs["code"])
+        session.mark_analyzed(session.code)
+    await sessions.save(session)
+
+
+async def needs_code_check(inputs):
+    if not inputs['code'].strip():
+        code_classifier.stats.incr("no_code")
+        return False
+    needs_code, confidence = code_classifier.classify(inputs['question'])
+    if confidence >= code_classifier.threshold:
+        code_classifier.stats.incr("local_code" if needs_code else "local_general")
+        return needs_code
+    # low confidence, ask the model
+    code_classifier.stats.incr("fallback")
+    with telemetry.stage("explain", "precheck"):
+        precheck_result=await tiering.chain("precheck", *tiering.precheck_tier()).ainvoke({"question":inputs['question']})
+    needs_code=str(precheck_result.content).strip()
+    logger.debug("Pre-check result: %r (local confidence %.2f)", needs_code, confidence)
+    return needs_code == "1"
+
+
+async def uses_code(inputs):
+    # recorded on the inputs so the endpoint knows whether the answer analysed the code
+    inputs["used_code"] = await needs_code_check(inputs)
+    return inputs["used_code"]
+
+
+async def answer_without_code(input_stream):
+    """General questions, answered from the semantic cache when possible."""
+    async for inputs in input_stream:
+        pass
+    question = inputs["question"]
+    cacheable = SemanticCache.cacheable(question)
+    if cacheable:
+        cached = semantic_cache.get(inputs["problem_key"], question)
+        if cached is not None:
+            logger.debug("Semantic cache hit for %s", inputs["problem_key"])
+            yield AIMessageChunk(content=cached)
+            return
+    answer = ""
+    chain = tiering.chain("explain_without_code", *tiering.explain_tier(inputs, needs_code=False))
+    async for chunk in chain.astream(inputs):
+        answer += chunk.content if isinstance(chunk.content, str) else ""
+        yield chunk
+    if cacheable and answer:
+        semantic_cache.set(inputs["problem_key"], question, answer)
+
+
+def answer_with_code(inputs):
+    return tiering.chain("explain_with_code", *tiering.explain_tier(inputs, needs_code=True))
+
+
+# The tier picks the failover order (Groq's Llama-3.1-8b-instant first for
+# most turns) and the output cap. Chains are built once per tier; everything
+# request-specific travels in the inputs.
+explain_chain = RunnableBranch(
+    (uses_code, RunnableLambda(answer_with_code)),
+    RunnableGenerator(answer_without_code)
+)
+
+
+def explain_inputs(problem, code, chat_history, question, problem_id=None, analyzed_code=None):
+    """Chain inputs with problem, code and history packed into the token budget.
+
+    With ``analyzed_code`` (what an earlier answer in the history analysed)
+    the code is sent as a diff against it when that is smaller.
+    """
+    problem_key = problem_id or hashlib.sha1(problem.encode("utf-8")).hexdigest()
+    with telemetry.stage("explain", "prompt_build"):
+        code, code_mode = code_differ.view(analyzed_code, code)
+        problem, code, chat_history = context_packer.pack_explain(problem, code, chat_history, question, EXPLAIN_BUDGET)
+        size = count_tokens(problem) + count_tokens(code) + count_tokens(question)
+        size += sum(count_tokens(str(msg.content)) for msg in chat_history)
+    telemetry.prompt_size.labels("explain").observe(size)
+    return {
+        "problem": problem,
+        "chat_history": chat_history,
+        "question": question,
+        "code": code,
+        "code_mode": code_mode,
+        "problem_key": problem_key,
+        "prompt_tokens": size,
+    }
+
+
+@app.post("/api/explain")
+async def explain_que(request:explainRequest, response:Response):
+    try:
+        with telemetry.stage("explain", "parse"):
+            problem, code, chat_history, question, session = await load_chat(request)
+        problem_id = request.problem_id or (session.problem_id if session else None)
+        inputs = explain_inputs(problem, code, chat_history, question, problem_id, session and session.analyzed_code)
+        response.headers["X-Prompt-Tokens"] = str(inputs["prompt_tokens"])
+        with telemetry.stage("explain", "generate"):
+            result = await explain_chain.ainvoke(inputs)
+        telemetry.log_body("Explain response", result.content)
+        if session is None:
+            return ExplainResponse(explanation=result.content)
+        await save_turn(session, question, result.content, inputs)
+        return ExplainResponse(explanation=result.content, session_id=session.id)
+    except SessionNotFound:
+        return JSONResponse(status_code=404, content={"error": "Unknown or expired session"})
+    except CodeOutOfSync:
+        return code_out_of_sync_response(request.session_id)
+    except Overloaded as e:
+        return overloaded_response(e)
     except Exception as e:
-        print("An error occurred in /api/explain:", e)
-        traceback.print_exc()
+        logger.exception("An error occurred in /api/explain")
         return JSONResponse(
             status_code=500,
             content={"error": "Failed to generate explanation", "details": str(e)}
         )
 
 
+# hints are keyed on the tier's failover order rather than the model that served them:
+# a failover answer is as good for the same prompt, and the lookup comes before the call
+def hint_cache_key(problem):
+   models=tiering.models(*tiering.hint_tier(problem.difficulty))
+   return HintCache.make_key(problem.id, problem.description, models, HINT_PROMPT_VERSION)
+
+
+def hint_inputs(problem):
+   with telemetry.stage("hint", "prompt_build"):
+      return {
+         "title": problem.title,
+         "difficulty": problem.difficulty,
+         "description": context_packer.pack_description(problem.description, HINT_BUDGET)
+      }
+
+
+def message_text(message):
+   return message.content if isinstance(message.content, str) else ""
+
+
+async def parse_hint_output(text, inputs, endpoint):
+   """Tolerant parse of the hint answer; only levels that are missing are asked for again"""
+   with telemetry.stage(endpoint, "output_parse"):
+      try:
+         title, hints, repaired = parse_hints(text)
+      except HintParseError:
+         title, hints, repaired = None, {}, True
+   missing = missing_levels(hints)
+   if missing:
+      logger.warning("Hint output missing levels %s, asking again", missing)
+      with telemetry.stage(endpoint, "reask"):
+         chain = tiering.chain("hint_missing", *tiering.hint_tier(inputs["difficulty"]))
+         message = await chain.ainvoke(dict(
+            inputs,
+            given=json.dumps({str(level): hint for level, hint in hints.items()}),
+            levels=", ".join(map(str, missing)),
+         ))
+      try:
+         _, extra, _ = parse_hints(message_text(message))
+      except HintParseError:
+         extra = {}
+      hints.update({level: extra[level] for level in missing if level in extra})
+      if missing_levels(hints):
+         telemetry.parse_outcomes.labels("hint", "failed").inc()
+         raise HintParseError(f"Hint levels {missing_levels(hints)} missing after asking again")
+   telemetry.parse_outcomes.labels("hint", "reasked" if missing else "repaired" if repaired else "clean").inc()
+   return MultiLevelHint(problem_title=title or inputs["title"], hints=hints)
+
+
+async def compute_hints(problem, cache_key):
+   """Run the hint chain and store the parsed hints in the hint cache"""
+   inputs = hint_inputs(problem)
+   telemetry.prompt_size.labels("hint").observe(prompt_tokens(prompts.get("hint").invoke(inputs)))
+   with telemetry.stage("hint", "generate"):
+      message = await tiering.chain("hint", *tiering.hint_tier(problem.difficulty)).ainvoke(inputs)
+   result = await parse_hint_output(message_text(message), inputs, "hint")
+   telemetry.log_body("Hint response", result.hints)
+   value=result.model_dump()
+   await hint_cache.set(cache_key, value)
+   return value
+
+
+def hint_level_key(problem, level):
+   return HintCache.make_key(problem.id, problem.description, tiering.models("hint_level"), f"{HINT_LEVEL_PROMPT_VERSION}/level-{level}")
+
+
+hint_prefetch_stats = {"started": 0, "failed": 0}
+_prefetch_tasks = set()
+
+
+async def cached_levels(problem, upto, record=True):
+   """Levels 1..upto already known, from the full hint cache or the per-level cache
+
+   The reads behind it count as one cache lookup, a hit only if level ``upto`` was found.
+   """
+   full=await hint_cache.get(hint_cache_key(problem), record=False)
+   levels={}
+   if full is not None:
+      levels={level: hint for level, hint in MultiLevelHint(**full).hints.items() if level <= upto}
+   else:
+      for level in range(1, upto + 1):
+         cached=await hint_cache.get(hint_level_key(problem, level), record=False)
+         if cached is None:
+            break
+         levels[level]=cached["hint"]
+   if record:
+      hint_cache.count(upto in levels)
+   return levels
+
+
+async def compute_levels(problem, upto):
+   """Generate the levels up to ``upto`` that are not cached, in one call conditioned on the earlier ones"""
+   known=await cached_levels(problem, upto, record=False)
+   missing=[level for level in range(1, upto + 1) if level not in known]
+   if not missing:
+      return known
+   inputs=hint_inputs(problem)
+   with telemetry.stage("hint_level", "generate"):
+      chain=tiering.chain("hint_missing", *tiering.level_tier(missing, problem.difficulty))
+      message=await chain.ainvoke(dict(
+         inputs,
+         given=json.dumps({str(level): hint for level, hint in known.items()}),
+         levels=", ".join(map(str, missing)),
+      ))
+   with telemetry.stage("hint_level", "output_parse"):
+      try:
+         _, extra, repaired=parse_hints(message_text(message))
+      except HintParseError:
+         extra, repaired={}, True
+   if any(level not in extra for level in missing):
+      telemetry.parse_outcomes.labels("hint_level", "failed").inc()
+      raise HintParseError(f"Hint levels {[l for l in missing if l not in extra]} missing from model output")
+   telemetry.parse_outcomes.labels("hint_level", "repaired" if repaired else "clean").inc()
+   for level in missing:
+      known[level]=extra[level]
+      await hint_cache.set(hint_level_key(problem, level), {"hint": extra[level]})
+   return known
+
+
+async def levels_upto(problem, level, record=True):
+   """Hints 1..level, generating only what is missing; concurrent callers share one generation"""
+   known=await cached_levels(problem, level, record)
+   if level in known:
+      return known
+
+   async def ready():
+      levels=await cached_levels(problem, level, record=False)
+      return levels if level in levels else None
+
+   return await hint_flight.do(hint_level_key(problem, level), lambda: compute_levels(problem, level), check=ready)
+
+
+def prefetch_level(problem, level):
+   """Generate ``level`` in the background while the user reads the one before it"""
+   if not HINT_PREFETCH or level > 4 or hint_flight.in_flight(hint_level_key(problem, level)):
+      return
+
+   async def run():
+      # background reads are left out of the hit/miss counts
+      if level not in await cached_levels(problem, level, record=False):
+         hint_prefetch_stats["started"]+=1
+         # queued behind interactive work, and shed first under load
+         with priority(BACKGROUND):
+            await levels_upto(problem, level, record=False)
+
+   task=asyncio.create_task(run())
+   _prefetch_tasks.add(task)
+
+   def done(task):
+      _prefetch_tasks.discard(task)
+      if not task.cancelled() and task.exception() is not None:
+         hint_prefetch_stats["failed"]+=1
+         logger.warning("Hint prefetch for level %s failed: %s", level, task.exception())
+
+   task.add_done_callback(done)
+
+
+async def drain_prefetches(timeout):
+   """Give background hint prefetches up to ``timeout`` seconds to land in the cache, then cancel the rest"""
+   if _prefetch_tasks:
+      await asyncio.wait(list(_prefetch_tasks), timeout=timeout)
+      for task in list(_prefetch_tasks):
+         task.cancel()
+
+
+def hint_etag(cache_key, hints):
+   return etag({"key": cache_key, "hint": hints})
+
 
 @app.post("/api/hint",response_model=HintResponse)
-async def generate_hint(request:HintRequest):
-   """Generate a progressive hint for the given problem"""
+async def generate_hint(request:HintRequest, response:Response):
+   """Generate a progressive hint for the given problem
+
+   In mode "all" the response names the cached hints in Content-Location,
+   with their ETag, so they can be revalidated with a conditional GET.
+   """
 
    try:
       problem=request.problem_data
       #print("problem",problem,flush=True)
-      prompt_template=ChatPromptTemplate(
-      [
-      ("system", 
-     "You are a helpful coding tutor. "
-     "Provide a progressive hint for a programming problem based on the requested hint level. "
-     "Never give away the full solution. "
-     "Hint levels: "
-     "1 = Give a conceptual hint about the general approach or pattern needed. Don't mention specific algorithms or data structures yet. Focus on the key insight that leads to the solution. "
-     "2 = Suggest the specific algorithm, data structure, or technique to use. Explain why this approach is suitable for this problem type. "
-     "3 = Provide a step-by-step outline of the solution approach. Break down the algorithm into clear steps without giving code. "
-     "4 = Give implementation hints including edge cases to consider, time/space complexity, and common pitfalls to avoid."
-     "Respond ONLY with a valid JSON object in this format: "
-       '{{"problem_title": "<title>", "hints": {{"1": "<hint1>", "2": "<hint2>", "3": "<hint3>", "4": "<hint4>"}}}}'
-    ),
-    ("human",""" 
-Problem Titile: {title}
-Difficulty: {difficulty}
-Description: {description}
-
-
-Give all level hints for this problem level 1,2,3,4
-""")
-         ]
-      )
-      print("Prompt template created.")
-      model = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash",
-             temperature=0,
-             max_output_tokens=2012,
-             timeout=60,
-             max_retries=2,
-      )
-      parser=PydanticOutputParser(pydantic_object=MultiLevelHint)
-
-      chain = prompt_template | model | parser
-
-      result = chain.invoke({
-    "title": problem.title,
-    "difficulty": problem.difficulty,
-    "description": problem.description
-})
-      print("Chain result:", result.hints)
+      if request.mode == "level":
+         with priority(HINT):
+            hints=await levels_upto(problem, request.hint_level)
+         prefetch_level(problem, request.hint_level + 1)
+      else:
+         cache_key=hint_cache_key(problem)
+         cached=await hint_cache.get(cache_key)
+         if cached is None:
+            # concurrent requests for the same problem share one generation
+            with priority(HINT):
+               cached=await hint_flight.do(
+                  cache_key,
+                  lambda: compute_hints(problem, cache_key),
+                  check=lambda: hint_cache.get(cache_key, record=False),
+               )
+         hints=MultiLevelHint(**cached).hints
+         response.headers["ETag"]=hint_etag(cache_key, hints)
+         response.headers["Content-Location"]=f"/api/hint/cached/{cache_key}"
       return HintResponse(
-            hint=result.hints,
+            hint=hints,
             problem_title=problem.title,
             timestamp=datetime.datetime.now().isoformat()
         )
 
+   except Overloaded as e:
+      return overloaded_response(e)
    except Exception as e:
-      print("An error occurred:",e)
+      logger.exception("An error occurred in /api/hint")
+      return JSONResponse(
+         status_code=500,
+         content={"error": "Failed to generate hint", "details": str(e)}
+      )
+
+
+@app.get("/api/hint/cached/{cache_key}",response_model=HintResponse)
+async def cached_hint(cache_key:str, response:Response, if_none_match:Optional[str]=Header(None)):
+   """Hints already in the cache, never generated; an empty 304 while If-None-Match still matches"""
+   cached=await hint_cache.get(cache_key)
+   if cached is None:
+      return JSONResponse(status_code=404, content={"error": "Hints not cached"})
+   result=MultiLevelHint(**cached)
+   tag=hint_etag(cache_key, result.hints)
+   if etag_matches(if_none_match, tag):
+      return Response(status_code=304, headers={"ETag": tag})
+   response.headers["ETag"]=tag
+   return HintResponse(
+      hint=result.hints,
+      problem_title=result.problem_title,
+      timestamp=datetime.datetime.now().isoformat()
+   )
+
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.post("/api/explain/stream")
+async def explain_stream(request:explainRequest):
+    """Stream the explanation as `token` events, then a final `done` event."""
+    try:
+        with telemetry.stage("explain_stream", "parse"):
+            problem, code, chat_history, question, session = await load_chat(request)
+    except SessionNotFound:
+        return JSONResponse(status_code=404, content={"error": "Unknown or expired session"})
+    except CodeOutOfSync:
+        return code_out_of_sync_response(request.session_id)
+
+    problem_id = request.problem_id or (session.problem_id if session else None)
+    inputs = explain_inputs(problem, code, chat_history, question, problem_id, session and session.analyzed_code)
+
+    async def events():
+        try:
+            answer = ""
+            async for chunk in explain_chain.astream(inputs):
+                if chunk.content:
+                    answer += chunk.content
+                    yield sse("token", {"text": chunk.content})
+            if session is None:
+                yield sse("done", {})
+                return
+            await save_turn(session, question, answer, inputs)
+            yield sse("done", {"session_id": session.id})
+        except Overloaded as e:
+            yield sse("error", {"error": "Overloaded, please retry", "retry_after": e.retry_after})
+        except Exception as e:
+            logger.exception("An error occurred in /api/explain/stream")
+            yield sse("error", {"error": "Failed to generate explanation", "details": str(e)})
+
+    headers = dict(SSE_HEADERS, **{"X-Prompt-Tokens": str(inputs["prompt_tokens"])})
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+
+@app.post("/api/hint/stream")
+async def generate_hint_stream(request:HintRequest):
+   """Stream each hint level as a `hint` event as soon as it is complete
+
+   In mode "level" only levels up to hint_level are sent, as /api/hint returns them.
+   """
+   problem=request.problem_data
+
+   async def events():
+      # the body is streamed from its own task, so this only affects this request
+      request_priority.set(HINT)
+      try:
+         if request.mode == "level":
+            hints=await levels_upto(problem, request.hint_level)
+            prefetch_level(problem, request.hint_level + 1)
+            for level,hint in sorted(hints.items()):
+               yield sse("hint", {"level": level, "hint": hint})
+            yield sse("done", {"problem_title": problem.title})
+            return
+
+         cache_key=hint_cache_key(problem)
+         cached=await hint_cache.get(cache_key)
+         if cached is not None:
+            for level,hint in sorted(MultiLevelHint(**cached).hints.items()):
+               yield sse("hint", {"level": level, "hint": hint})
+            yield sse("done", {"problem_title": problem.title})
+            return
+
+         # levels are queued as the leader streams them; a follower's generate
+         # never runs, so it only gets the end marker and replays the result
+         streamed=asyncio.Queue()
+
+         async def generate():
+            text=""
+            sent=set()
+            inputs=hint_inputs(problem)
+            async for chunk in tiering.chain("hint", *tiering.hint_tier(problem.difficulty)).astream(inputs):
+               text+=message_text(chunk)
+               for level,hint in extract_hint_levels(text).items():
+                  if level not in sent:
+                     sent.add(level)
+                     streamed.put_nowait((level, hint))
+            result=await parse_hint_output(text, inputs, "hint_stream")
+            value=result.model_dump()
+            await hint_cache.set(cache_key, value)
+            return value
+
+         flight=asyncio.ensure_future(hint_flight.do(
+            cache_key, generate, check=lambda: hint_cache.get(cache_key, record=False),
+         ))
+         flight.add_done_callback(lambda _: streamed.put_nowait(None))
+         sent=set()
+         while True:
+            item=await streamed.get()
+            if item is None:
+               break
+            level,hint=item
+            sent.add(level)
+            yield sse("hint", {"level": level, "hint": hint})
+         for level,hint in sorted(MultiLevelHint(**await flight).hints.items()):
+            if level not in sent:
+               yield sse("hint", {"level": level, "hint": hint})
+         yield sse("done", {"problem_title": problem.title})
+      except Overloaded as e:
+         yield sse("error", {"error": "Overloaded, please retry", "retry_after": e.retry_after})
+      except Exception as e:
+         logger.exception("An error occurred in /api/hint/stream")
+         yield sse("error", {"error": "Failed to generate hints", "details": str(e)})
+
+   return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+hint_batch_chain = prompts.get("hint_batch") | hint_batch_model
+hint_batch_stats = {"cached": 0, "grouped": 0, "single": 0, "failed": 0}
+
+
+def hint_batch_inputs(group):
+   # the per-problem share of the hint prompt budget
+   budget = HINT_BUDGET // len(group)
+   with telemetry.stage("hint_batch", "prompt_build"):
+      return {"problems": "\n---\n".join(
+         f"Problem id: {p.id}\nProblem Title: {p.title}\nDifficulty: {p.difficulty}\n"
+         f"Description: {context_packer.pack_description(p.description, budget)}"
+         for p in group
+      )}
+
+
+def hint_line(problem, value, cached):
+   return {"id": problem.id, "problem_title": problem.title, "hint": MultiLevelHint(**value).hints, "cached": cached}
+
+
+def hint_error_line(problem, e):
+   if isinstance(e, Overloaded):
+      return {"id": problem.id, "error": "Overloaded, please retry", "retry_after": e.retry_after}
+   return {"id": problem.id, "error": "Failed to generate hints", "details": str(e)}
+
+
+async def compute_hint_group(group):
+   """Hints for a group of cache misses from one multi-problem call.
+
+   Problems the combined answer leaves incomplete are generated one by one
+   through the single-problem path, which re-asks for missing levels.
+   """
+   answered = {}
+   if len(group) > 1:
+      try:
+         with telemetry.stage("hint_batch", "generate"):
+            message = await hint_batch_chain.ainvoke(hint_batch_inputs(group))
+         with telemetry.stage("hint_batch", "output_parse"):
+            answered = parse_batch_hints(message_text(message))
+      except Exception as e:
+         logger.warning("Multi-problem hint call failed, generating one by one: %s", e)
+
+   async def one(problem):
+      cache_key = hint_cache_key(problem)
+      hints = answered.get(problem.id, {})
+      try:
+         if not missing_levels(hints):
+            value = MultiLevelHint(problem_title=problem.title, hints=hints).model_dump()
+            await hint_cache.set(cache_key, value)
+            hint_batch_stats["grouped"] += 1
+         else:
+            value = await hint_flight.do(
+               cache_key,
+               lambda: compute_hints(problem, cache_key),
+               check=lambda: hint_cache.get(cache_key, record=False),
+            )
+            hint_batch_stats["single"] += 1
+         return hint_line(problem, value, cached=False)
+      except Exception as e:
+         hint_batch_stats["failed"] += 1
+         if not isinstance(e, Overloaded):
+            logger.exception("Batch hints failed for %s", problem.id)
+         return hint_error_line(problem, e)
+
+   return await asyncio.gather(*(one(problem) for problem in group))
+
+
+@app.post("/api/hint/batch")
+async def generate_hint_batch(request:HintBatchRequest):
+   """Hints for many problems as NDJSON, one line per problem as soon as it is ready.
+
+   Cache hits are written first; misses are generated HINT_BATCH_GROUP to a
+   prompt with at most HINT_BATCH_CONCURRENCY prompts in flight. A final
+   `{"done": true, ...}` line summarises the batch.
+   """
+   problems=list({problem.id: problem for problem in request.problems}.values())
 
+   async def lines():
+      cached=await asyncio.gather(*(hint_cache.get(hint_cache_key(problem)) for problem in problems))
+      misses=[]
+      for problem,value in zip(problems, cached):
+         if value is None:
+            misses.append(problem)
+         else:
+            hint_batch_stats["cached"]+=1
+            yield ndjson(hint_line(problem, value, cached=True))
 
+      limit=asyncio.Semaphore(HINT_BATCH_CONCURRENCY)
 
+      async def run(group):
+         async with limit:
+            # batch work yields to interactive chat and hint requests
+            with priority(BACKGROUND):
+               return await compute_hint_group(group)
 
+      groups=[misses[i:i + HINT_BATCH_GROUP] for i in range(0, len(misses), HINT_BATCH_GROUP)]
+      failed=0
+      for finished in asyncio.as_completed([run(group) for group in groups]):
+         for line in await finished:
+            failed+="error" in line
+            yield ndjson(line)
+      yield ndjson({"done": True, "problems": len(problems), "cached": len(problems) - len(misses), "failed": failed})
 
+   return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"Cache-Control": "no-cache"})
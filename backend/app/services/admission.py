@@ -0,0 +1,229 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from app.services.env import parse_mapping
+from app.services.shared_state import SharedState
+from app.services.telemetry import logger
+
+# lower runs first
+INTERACTIVE, HINT, BACKGROUND = 0, 1, 2
+
+request_priority = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def priority(level):
+    """Run provider calls made inside the block at ``level``."""
+    token = request_priority.set(level)
+    try:
+        yield
+    finally:
+        request_priority.reset(token)
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class PriorityLimiter:
+    """At most ``capacity`` concurrent holders, with a bounded priority queue behind them.
+
+    Waiters are served lowest priority value first, FIFO within a priority.
+    When the queue is full a newcomer displaces the lowest-priority waiter if
+    it outranks it, otherwise it is shed at once; waiters are also shed after
+    ``max_wait`` seconds. Shed callers get ``Overloaded`` with a Retry-After
+    estimate from the average hold time.
+    """
+
+    def __init__(self, capacity, max_queue=64, max_wait=10.0):
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.hold_time = 1.0  # moving average, seconds
+        self.admitted = 0
+        self.shed = 0
+        self._waiters = []  # heap of [priority, seq, future]
+        self._seq = itertools.count()
+
+    def retry_after(self):
+        return max(1, math.ceil(self.hold_time * (len(self._waiters) + 1) / self.capacity))
+
+    def _shed(self):
+        self.shed += 1
+        return Overloaded(self.retry_after())
+
+    def _remove(self, entry):
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    async def acquire(self, priority=INTERACTIVE):
+        if self.active < self.capacity and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            worst = max(self._waiters)
+            if worst[0] <= priority:
+                raise self._shed()
+            self._remove(worst)
+            worst[2].set_exception(self._shed())
+        entry = [priority, next(self._seq), asyncio.get_running_loop().create_future()]
+        heapq.heappush(self._waiters, entry)
+        future = entry[2]
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # the slot was handed over just as we gave up
+                self.release(0.0)
+            else:
+                future.cancel()
+                self._remove(entry)
+            if isinstance(e, asyncio.TimeoutError):
+                raise self._shed()
+            raise
+        self.admitted += 1
+
+    def release(self, held):
+        self.hold_time = 0.8 * self.hold_time + 0.2 * held
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # hand the slot straight to the next waiter
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority=INTERACTIVE):
+        await self.acquire(priority)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+    def snapshot(self):
+        return {"active": self.active, "queued": len(self._waiters), "admitted": self.admitted, "shed": self.shed}
+
+
+class AdmissionControl:
+    """Per-client request rate limits and per-provider concurrency caps.
+
+    Clients (an extension install id, else the remote address) each get a
+    token bucket of ``client_rate`` requests per second with ``client_burst``
+    capacity, kept in shared state so the limit holds across workers. The
+    install id is chosen by the client, so each remote address also gets a
+    looser ``address_rate``/``address_burst`` bucket that a client rotating
+    ids still runs into.
+    Provider calls take a slot from that provider's PriorityLimiter at the
+    priority of the current request; the caps are per worker.
+    """
+
+    def __init__(self, client_rate=2.0, client_burst=20, concurrency=None, default_concurrency=16,
+                 queue_size=64, queue_timeout=10.0, max_clients=10000, state=None,
+                 address_rate=10.0, address_burst=100):
+        self.client_rate = client_rate
+        self.client_burst = client_burst
+        self.address_rate = address_rate
+        self.address_burst = address_burst
+        self.concurrency = concurrency or {}
+        self.default_concurrency = default_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rejected = 0
+        self._clients = (state or SharedState()).table("ratelimit", max_entries=max_clients)
+        self._providers = {}
+
+    @classmethod
+    def from_env(cls, state=None):
+        return cls(
+            state=state,
+            client_rate=float(os.getenv("ADMISSION_CLIENT_RATE", "2")),
+            client_burst=int(os.getenv("ADMISSION_CLIENT_BURST", "20")),
+            address_rate=float(os.getenv("ADMISSION_ADDRESS_RATE", "10")),
+            address_burst=int(os.getenv("ADMISSION_ADDRESS_BURST", "100")),
+            concurrency=parse_mapping(os.getenv("ADMISSION_PROVIDER_CONCURRENCY", "groq=8,google=16")),
+            default_concurrency=int(os.getenv("ADMISSION_DEFAULT_CONCURRENCY", "16")),
+            queue_size=int(os.getenv("ADMISSION_QUEUE_SIZE", "64")),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")),
+        )
+
+    async def check_client(self, client_id, address=None):
+        """0 when the request is admitted, else seconds until it would be."""
+        if self.client_rate <= 0:
+            return 0.0
+        buckets = [(client_id, self.client_rate, self.client_burst)]
+        if address is not None and address != client_id and self.address_rate > 0:
+            buckets.append((f"address:{address}", self.address_rate, self.address_burst))
+        try:
+            wait = max([await self._clients.take(key, rate, burst) for key, rate, burst in buckets])
+        except Exception as e:
+            # fail open: losing the limiter must not take the API down
+            logger.warning("Rate limit check failed: %s", e)
+            return 0.0
+        if wait:
+            self.rejected += 1
+        return wait
+
+    def provider(self, name):
+        limiter = self._providers.get(name)
+        if limiter is None:
+            capacity = self.concurrency.get(name, self.default_concurrency)
+            limiter = self._providers[name] = PriorityLimiter(capacity, self.queue_size, self.queue_timeout)
+        return limiter
+
+    def slot(self, provider):
+        return self.provider(provider).slot(request_priority.get())
+
+    def snapshot(self):
+        return {
+            "rejected": self.rejected,
+            "providers": {name: limiter.snapshot() for name, limiter in self._providers.items()},
+        }
+
+
+def client_address(scope):
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def client_id(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"x-client-id" and value:
+            return value.decode("latin-1")[:128]
+    return client_address(scope)
+
+
+class AdmissionMiddleware:
+    """ASGI middleware answering 429 with Retry-After to clients over their request rate."""
+
+    def __init__(self, app, admission, prefix="/api/"):
+        self.app = app
+        self.admission = admission
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"].startswith(self.prefix):
+            wait = await self.admission.check_client(client_id(scope), client_address(scope))
+            if wait:
+                from fastapi.responses import JSONResponse
+
+                retry_after = max(1, math.ceil(wait))
+                response = JSONResponse(
+                    status_code=429,
+                    content={"error": "Too many requests", "retry_after": retry_after},
+                    headers={"Retry-After": str(retry_after)},
+                )
+                return await response(scope, receive, send)
+        await self.app(scope, receive, send)
@@ -0,0 +1,91 @@
+import json
+import math
+import os
+import re
+import threading
+
+# (pattern, weight) — positive weights mean the question needs the user's code
+RULES = [
+    (r"\b(my|this|the above|attached) (code|solution|implementation|function|loop|program)\b", 3.0),
+    (r"\b(debug|fix|bug|buggy|broken|wrong answer|fails?|failing|crash(es|ing)?|exception|traceback)\b", 2.5),
+    (r"\b(tle|time limit exceeded|mle|runtime error|compile error|syntax error|index ?error|null ?pointer|segfault)\b", 3.0),
+    (r"\b(why (does|doesn't|is|isn't|am i)|what'?s wrong|where('s| is) the (mistake|error|issue))\b", 1.5),
+    (r"\b(review|improve|optimi[sz]e|refactor|clean up|speed up) (my|this|it)\b", 2.5),
+    (r"\bline \d+\b|\bvariable\b|\b(my|this) (if|for|while|return)\b", 2.0),
+    (r"\b(is (my|this)|does (my|this)|will (my|this)) .*\b(correct|right|work|pass)\b", 2.5),
+    (r"\bwhat does (this|my)\b|\bexplain (my|this) (code|solution|line)\b", 2.5),
+    (r"^\s*(hi|hello|hey|thanks|thank you|ok|okay|cool|bye|good (morning|evening|night))\b[\s!.]*$", -4.0),
+    (r"\b(what is|what are|define|definition of|difference between|when (should|do) (i|you) use)\b", -1.5),
+    (r"\b(hint|approach|intuition|pattern|idea|how (should|do|can) i (start|approach|think))\b", -1.5),
+    (r"\b(explain|understand) the (problem|question|example|constraints?)\b", -2.5),
+    (r"\b(big[- ]?o|complexity of (a|an|the) (hash|heap|sort|tree|graph|binary search))\b", -1.0),
+]
+BIAS = -0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+class ClassifierStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"local_code": 0, "local_general": 0, "fallback": 0, "no_code": 0}
+
+    def incr(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self.counts)
+        total = sum(counts.values())
+        counts["total"] = total
+        counts["fallback_rate"] = counts["fallback"] / total if total else 0.0
+        return counts
+
+
+class CodeRelevanceClassifier:
+    """Decides locally whether answering a chat question requires the user's code.
+
+    Scores the question with weighted regex rules, plus token weights from an
+    optional JSON model (``{"bias": float, "weights": {token: float}}``), and
+    squashes the sum into a probability. ``classify`` returns the decision and
+    its confidence; callers fall back to the LLM precheck below ``threshold``.
+    """
+
+    def __init__(self, threshold=0.8, model_path=None):
+        self.threshold = threshold
+        self.rules = [(re.compile(p, re.IGNORECASE), w) for p, w in RULES]
+        self.bias = BIAS
+        self.token_weights = {}
+        self.stats = ClassifierStats()
+        if model_path:
+            self.load(model_path)
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            threshold=float(os.getenv("CODE_CLASSIFIER_THRESHOLD", "0.8")),
+            model_path=os.getenv("CODE_CLASSIFIER_MODEL"),
+        )
+
+    def load(self, path):
+        with open(path) as f:
+            model = json.load(f)
+        self.bias += model.get("bias", 0.0)
+        self.token_weights = model.get("weights", {})
+
+    def score(self, question):
+        """Probability that the question needs the code."""
+        text = question.strip()
+        total = self.bias
+        for pattern, weight in self.rules:
+            if pattern.search(text):
+                total += weight
+        if self.token_weights:
+            for token in _TOKEN_RE.findall(text.lower()):
+                total += self.token_weights.get(token, 0.0)
+        return 1.0 / (1.0 + math.exp(-total))
+
+    def classify(self, question):
+        p = self.score(question)
+        return p >= 0.5, max(p, 1.0 - p)
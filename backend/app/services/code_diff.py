@@ -0,0 +1,73 @@
+import difflib
+import hashlib
+import os
+
+from app.services.context_packing import count_tokens
+
+
+class CodeOutOfSync(Exception):
+    """The client's code hash or edit does not match the session's code."""
+
+
+def code_hash(code):
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def apply_edit(base, start, end, lines):
+    """Replace lines ``start:end`` of ``base`` (split on newlines) with ``lines``."""
+    base_lines = base.split("\n")
+    if not 0 <= start <= end <= len(base_lines):
+        raise CodeOutOfSync(f"Edit {start}:{end} is outside the {len(base_lines)}-line code")
+    return "\n".join(base_lines[:start] + list(lines) + base_lines[end:])
+
+
+def changed_hunks(old, new, context=3):
+    """Unified diff hunks (without file headers) from ``old`` to ``new``."""
+    diff = difflib.unified_diff(old.split("\n"), new.split("\n"), lineterm="", n=context)
+    return "\n".join(line for line in diff if not line.startswith(("---", "+++")))
+
+
+UNCHANGED = "(Unchanged since your previous review of this code in this conversation.)"
+
+
+class CodeDiffer:
+    """Decides what code a follow-up turn sends to the model.
+
+    Once the assistant has analysed the session's code, later code questions
+    get only the changed hunks (with ``context`` lines around them) and rely
+    on that earlier answer for the rest. A diff is only used while it is at
+    most ``max_ratio`` of the full code's tokens; larger rewrites are sent in
+    full.
+    """
+
+    def __init__(self, context=3, max_ratio=0.5, enabled=True):
+        self.context = context
+        self.max_ratio = max_ratio
+        self.enabled = enabled
+        self.stats = {"full": 0, "diff": 0, "unchanged": 0, "tokens_saved": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            context=int(os.getenv("CODE_DIFF_CONTEXT", "3")),
+            max_ratio=float(os.getenv("CODE_DIFF_MAX_RATIO", "0.5")),
+            enabled=os.getenv("CODE_DIFF", "1") == "1",
+        )
+
+    def view(self, analyzed, code):
+        """Return (code text for the prompt, mode); mode is full, diff or unchanged."""
+        if not self.enabled or not analyzed or not code.strip():
+            return code, "full"
+        if analyzed == code:
+            return UNCHANGED, "unchanged"
+        hunks = changed_hunks(analyzed, code, self.context)
+        full = count_tokens(code)
+        text = f"Changes since your previous review (unified diff; all other lines are unchanged):\n{hunks}"
+        if count_tokens(text) > full * self.max_ratio:
+            return code, "full"
+        return text, "diff"
+
+    def record(self, mode, code, sent):
+        self.stats[mode] += 1
+        if mode != "full":
+            self.stats["tokens_saved"] += max(count_tokens(code) - count_tokens(sent), 0)
@@ -0,0 +1,193 @@
+import html
+import os
+import re
+
+from app.services.env import parse_mapping
+
+try:
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # not installed, or the encoding could not be loaded
+    _ENCODING = None
+
+
+def count_tokens(text):
+    """Token count with tiktoken when available, else ~4 characters per token."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_BOILERPLATE_RES = [
+    # meta description prefix LeetCode puts in front of the statement
+    re.compile(r"Can you solve this real interview question\?\s*([^\n]+?\s+-\s+)?", re.IGNORECASE),
+    re.compile(r"Seen this question in a real interview before\?.*$", re.IGNORECASE | re.DOTALL),
+    re.compile(r"^\s*(Accepted|Submissions|Acceptance Rate|Topics|Companies|Similar Questions|Discussion|Hint \d+)\b.*$",
+               re.IGNORECASE | re.MULTILINE),
+    re.compile(r"Copyright ©.*$", re.IGNORECASE | re.MULTILINE),
+]
+
+
+def clean_description(text):
+    """Strip HTML, entities and LeetCode page boilerplate from a scraped description."""
+    text = html.unescape(_TAG_RE.sub(" ", text or ""))
+    for pattern in _BOILERPLATE_RES:
+        text = pattern.sub("", text)
+    lines = [" ".join(line.split()) for line in text.splitlines()]
+    return "\n".join(line for line in lines if line).strip()
+
+
+def truncate_tokens(text, budget):
+    """Keep the head of ``text`` within ``budget`` tokens, marking the cut."""
+    if count_tokens(text) <= budget:
+        return text
+    marker = "\n[... truncated ...]"
+    budget -= count_tokens(marker)
+    # shrink by characters proportionally, then tighten
+    keep = int(len(text) * max(budget, 0) / count_tokens(text))
+    while keep > 0 and count_tokens(text[:keep]) > budget:
+        keep = int(keep * 0.9)
+    return text[:keep].rstrip() + marker
+
+
+_IDENT_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+_LINE_REF_RE = re.compile(r"\bline\s+(\d+)\b", re.IGNORECASE)
+
+
+def _code_blocks(lines):
+    """Split code into blocks at blank lines and top-level definitions."""
+    blocks, start = [], 0
+    for i, line in enumerate(lines):
+        new_def = i > start and re.match(r"\s{0,4}(def |class |function |public |private |int |void |var |let |const )", line)
+        if i > start and (not line.strip() or new_def):
+            blocks.append((start, i))
+            start = i
+    blocks.append((start, len(lines)))
+    return [(a, b) for a, b in blocks if any(l.strip() for l in lines[a:b])]
+
+
+def pack_code(code, question, budget):
+    """Fit code into ``budget`` tokens, keeping the regions most relevant to the question.
+
+    Blocks are scored by identifiers shared with the question and by
+    ``line N`` references; the first block (usually the signature) is always
+    kept. Omitted regions are replaced by a marker so line context survives.
+    """
+    if count_tokens(code) <= budget:
+        return code
+    lines = code.splitlines()
+    blocks = _code_blocks(lines)
+    words = set(_IDENT_RE.findall(question))
+    refs = {int(n) - 1 for n in _LINE_REF_RE.findall(question)}
+
+    def score(block):
+        a, b = block
+        text = "\n".join(lines[a:b])
+        hits = len(words & set(_IDENT_RE.findall(text)))
+        return hits * 2 + (5 if any(a <= r < b for r in refs) else 0)
+
+    chosen, used = set(), 0
+    order = [blocks[0]] + sorted(blocks[1:], key=score, reverse=True)
+    for block in order:
+        cost = count_tokens("\n".join(lines[block[0] : block[1]]))
+        if used + cost > budget:
+            continue
+        chosen.add(block)
+        used += cost
+    if not chosen:
+        return truncate_tokens(code, budget)
+
+    out, last = [], 0
+    for a, b in blocks:
+        if (a, b) not in chosen:
+            continue
+        if a > last:
+            out.append(f"# ... {a - last} lines omitted ...")
+        out.extend(lines[a:b])
+        last = b
+    if last < len(lines):
+        out.append(f"# ... {len(lines) - last} lines omitted ...")
+    return "\n".join(out)
+
+
+def first_sentence(text, limit=160):
+    text = " ".join(text.split())
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= limit else sentence[: limit - 3] + "..."
+
+
+def pack_history(messages, budget):
+    """Keep the most recent messages within ``budget``; compress the rest.
+
+    Older messages are replaced by one system message with the first
+    sentence of each; a summary message already at the head is kept as is.
+    """
+    from langchain_core.messages import SystemMessage
+
+    head = []
+    if messages and isinstance(messages[0], SystemMessage):
+        head, messages = [messages[0]], messages[1:]
+        budget -= count_tokens(str(head[0].content))
+    costs = [count_tokens(str(msg.content)) for msg in messages]
+    if sum(costs) <= budget:
+        return head + list(messages)
+    summary_budget = max(budget // 5, 50)
+    kept, used = [], 0
+    for msg, cost in zip(reversed(messages), reversed(costs)):
+        if used + cost > budget - summary_budget:
+            break
+        kept.append(msg)
+        used += cost
+    kept.reverse()
+    dropped = messages[: len(messages) - len(kept)]
+    lines = [f"{'User' if msg.type == 'human' else 'Assistant'}: {first_sentence(str(msg.content))}" for msg in dropped]
+    summary = truncate_tokens("\n".join(lines), summary_budget)
+    return head + [SystemMessage(content=f"Earlier in this conversation:\n{summary}")] + kept
+
+
+class ContextPacker:
+    """Per-model prompt budgets, split between description, code and history."""
+
+    DEFAULT_BUDGETS = {
+        "llama-3.1-8b-instant": 6000,
+        "gemini-1.5-flash": 24000,
+        "gemini-2.5-flash": 24000,
+    }
+
+    def __init__(self, budgets=None, default_budget=6000, shares=(0.3, 0.45, 0.25)):
+        self.budgets = dict(self.DEFAULT_BUDGETS, **(budgets or {}))
+        self.default_budget = default_budget
+        self.description_share, self.code_share, self.history_share = shares
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            budgets=parse_mapping(os.getenv("CONTEXT_BUDGETS", "")),
+            default_budget=int(os.getenv("CONTEXT_DEFAULT_BUDGET", "6000")),
+        )
+
+    def budget_for(self, routes):
+        """The smallest budget among the models a router may pick."""
+        return min(self.budgets.get(model, self.default_budget) for _, model, _ in routes)
+
+    def pack_explain(self, problem, code, chat_history, question, budget):
+        """Return packed (problem, code, chat_history) within ``budget`` tokens."""
+        budget -= count_tokens(question)
+        problem = truncate_tokens(clean_description(problem), int(budget * self.description_share))
+        code = pack_code(code, question, int(budget * self.code_share))
+        remaining = budget - count_tokens(problem) - count_tokens(code)
+        chat_history = pack_history(chat_history, max(remaining, int(budget * self.history_share)))
+        return problem, code, chat_history
+
+    def pack_description(self, description, budget):
+        return truncate_tokens(clean_description(description), int(budget * self.description_share))
+
+
+def prompt_tokens(prompt_value):
+    """Token count of a formatted chat prompt."""
+    return sum(count_tokens(str(m.content)) for m in prompt_value.to_messages())
@@ -0,0 +1,7 @@
+def parse_mapping(raw, value=int):
+    """``name=value,name=value`` settings (e.g. ``groq=8,google=16``) -> {name: value(text)}."""
+    mapping = {}
+    for item in filter(None, (part.strip() for part in raw.split(","))):
+        name, text = item.rsplit("=", 1)
+        mapping[name.strip()] = value(text.strip())
+    return mapping
@@ -0,0 +1,239 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.telemetry import logger
+
+
+class LRUCache:
+    """Small in-process LRU with per-entry expiry."""
+
+    def __init__(self, maxsize=2048):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at=None):
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLBackend:
+    """Durable store on SQLite (default) or Postgres through SQLAlchemy."""
+
+    def __init__(self, url, max_rows=50000):
+        from sqlalchemy import Column, Float, MetaData, String, Table, Text, create_engine
+
+        self.engine = create_engine(url, pool_pre_ping=True)
+        self.max_rows = max_rows
+        self._writes = 0
+        metadata = MetaData()
+        self.table = Table(
+            "hint_cache",
+            metadata,
+            Column("key", String(64), primary_key=True),
+            Column("value", Text, nullable=False),
+            Column("expires_at", Float, nullable=True),
+            Column("last_access", Float, nullable=False, index=True),
+        )
+        metadata.create_all(self.engine)
+
+    def get(self, key):
+        """``(value, expires_at)``, or None if the key is missing or expired."""
+        from sqlalchemy import delete, select, update
+
+        now = time.time()
+        with self.engine.begin() as conn:
+            row = conn.execute(
+                select(self.table.c.value, self.table.c.expires_at).where(self.table.c.key == key)
+            ).first()
+            if row is None:
+                return None
+            if row.expires_at is not None and row.expires_at < now:
+                conn.execute(delete(self.table).where(self.table.c.key == key))
+                return None
+            conn.execute(update(self.table).where(self.table.c.key == key).values(last_access=now))
+            return json.loads(row.value), row.expires_at
+
+    def set(self, key, value, expires_at=None):
+        from sqlalchemy import delete
+
+        now = time.time()
+        row = {"key": key, "value": json.dumps(value), "expires_at": expires_at, "last_access": now}
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.key == key))
+            conn.execute(self.table.insert().values(**row))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.evict()
+
+    def delete(self, key):
+        from sqlalchemy import delete
+
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.key == key))
+
+    def evict(self):
+        """Drop expired rows, then the least recently used ones above max_rows."""
+        from sqlalchemy import delete, func, select
+
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(delete(self.table).where(self.table.c.expires_at < now))
+            count = conn.execute(select(func.count()).select_from(self.table)).scalar()
+            extra = count - self.max_rows
+            if extra > 0:
+                oldest = select(self.table.c.key).order_by(self.table.c.last_access).limit(extra)
+                conn.execute(delete(self.table).where(self.table.c.key.in_(oldest.scalar_subquery())))
+
+
+class RedisBackend:
+    """Durable store on Redis; eviction is left to Redis' maxmemory policy."""
+
+    def __init__(self, url, prefix="hint:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, key):
+        with self.client.pipeline() as pipe:
+            raw, ttl_ms = pipe.get(self.prefix + key).pttl(self.prefix + key).execute()
+        if raw is None:
+            return None
+        return json.loads(raw), (time.time() + ttl_ms / 1000 if ttl_ms > 0 else None)
+
+    def set(self, key, value, expires_at=None):
+        ttl = None
+        if expires_at is not None:
+            ttl = max(1, int(expires_at - time.time()))
+        self.client.set(self.prefix + key, json.dumps(value), ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+def make_backend(url):
+    if not url or url == "memory":
+        return None
+    if url.startswith(("redis://", "rediss://")):
+        return RedisBackend(url)
+    return SQLBackend(url, max_rows=int(os.getenv("HINT_CACHE_MAX_ROWS", "50000")))
+
+
+class HintCache:
+    """Parsed MultiLevelHint payloads keyed by problem, description, model and prompt version.
+
+    Reads go to the in-process LRU first and fall through to the durable
+    backend, whose hits are promoted back into the LRU until the row's own
+    expiry. Reads with ``record=False`` (single-flight polls) are left out
+    of ``hits``/``misses``. A ``backend_url`` backend is built on first use
+    (off the event loop), so importing the app never pays for SQLAlchemy or
+    the schema check.
+    """
+
+    def __init__(self, backend=None, lru_size=2048, ttl=30 * 24 * 3600, backend_url=None):
+        self._backend = backend
+        self.backend_url = backend_url
+        self._backend_lock = threading.Lock()
+        self.lru = LRUCache(lru_size)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def durable(self):
+        return self._backend is not None or self.backend_url is not None
+
+    @property
+    def backend(self):
+        """The durable backend, built on first access; blocking, so call it from a thread."""
+        if self._backend is None and self.backend_url is not None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = make_backend(self.backend_url)
+        return self._backend
+
+    def connect(self):
+        """Build the durable backend now (e.g. from the warm-up thread)."""
+        return self.backend
+
+    @staticmethod
+    def make_key(problem_id, description, model, prompt_version):
+        desc_hash = hashlib.sha256(description.encode("utf-8")).hexdigest()
+        raw = f"{problem_id}|{desc_hash}|{model}|{prompt_version}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key, record=True):
+        value = self.lru.get(key)
+        if value is None and self.durable:
+            try:
+                found = await asyncio.to_thread(lambda: self.backend.get(key))
+            except Exception as e:
+                logger.warning("Hint cache backend read failed: %s", e)
+                found = None
+            if found is not None:
+                value, expires_at = found
+                self.lru.set(key, value, expires_at)
+        if record:
+            self.count(value is not None)
+        return value
+
+    def count(self, hit):
+        """Count one lookup, e.g. one made of several ``record=False`` reads."""
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    async def set(self, key, value):
+        expires_at = self._expires_at()
+        self.lru.set(key, value, expires_at)
+        if self.durable:
+            try:
+                await asyncio.to_thread(lambda: self.backend.set(key, value, expires_at))
+            except Exception as e:
+                logger.warning("Hint cache backend write failed: %s", e)
+
+    async def delete(self, key):
+        self.lru.delete(key)
+        if self.durable:
+            await asyncio.to_thread(lambda: self.backend.delete(key))
+
+    def _expires_at(self):
+        return time.time() + self.ttl if self.ttl else None
+
+    @classmethod
+    def from_env(cls):
+        url = os.getenv("HINT_CACHE_URL", "sqlite:///hint_cache.db")
+        return cls(
+            backend_url=None if url in ("", "memory") else url,
+            lru_size=int(os.getenv("HINT_CACHE_LRU_SIZE", "2048")),
+            ttl=int(os.getenv("HINT_CACHE_TTL", str(30 * 24 * 3600))),
+        )
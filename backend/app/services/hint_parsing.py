@@ -0,0 +1,113 @@
+import json
+import re
+
+from app.services.streaming import extract_hint_levels
+
+HINT_LEVELS = (1, 2, 3, 4)
+
+_FENCE_RE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_LEVEL_KEY_RE = re.compile(r"\d+")
+_TITLE_RE = re.compile(r'"problem_title"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+class HintParseError(ValueError):
+    pass
+
+
+def _snippets(text):
+    """JSON candidates in the model output, most likely first."""
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        yield fenced.group(1)
+    start = text.find("{")
+    if start != -1:
+        yield text[start:]
+
+
+def _decode(snippet):
+    """First JSON object in ``snippet``; trailing text is ignored and trailing commas repaired."""
+    decoder = json.JSONDecoder()
+    snippet = snippet.strip()
+    for attempt in (snippet, _TRAILING_COMMA_RE.sub(r"\1", snippet)):
+        try:
+            value, _ = decoder.raw_decode(attempt)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+
+def normalise_levels(hints):
+    """{level: hint} with int keys for levels 1-4.
+
+    Accepts ``"1"``/``1``/``"level_1"`` style keys and a plain list of hints.
+    """
+    items = enumerate(hints, 1) if isinstance(hints, list) else hints.items() if isinstance(hints, dict) else ()
+    levels = {}
+    for key, hint in items:
+        match = _LEVEL_KEY_RE.search(str(key))
+        if match and int(match.group()) in HINT_LEVELS and isinstance(hint, str) and hint.strip():
+            levels[int(match.group())] = hint.strip()
+    return levels
+
+
+def parse_hints(text):
+    """Return ``(problem_title, {level: hint}, repaired)`` from a hint answer.
+
+    Strict JSON is the fast path. Otherwise code fences, trailing text and
+    trailing commas are repaired locally, and as a last resort the complete
+    levels are scraped from a truncated answer. The result may be missing
+    levels; raises ``HintParseError`` only when no level could be read.
+    """
+    try:
+        value = json.loads(text)
+        if isinstance(value, dict):
+            levels = normalise_levels(value.get("hints", value))
+            if levels:
+                return value.get("problem_title"), levels, False
+    except json.JSONDecodeError:
+        pass
+
+    for snippet in _snippets(text):
+        value = _decode(snippet)
+        if value is not None:
+            levels = normalise_levels(value.get("hints", value))
+            if levels:
+                return value.get("problem_title"), levels, True
+
+    levels = extract_hint_levels(text)
+    if not levels:
+        raise HintParseError(f"No hint levels found in model output: {text[:200]!r}")
+    title = _TITLE_RE.search(text)
+    return (json.loads(f'"{title.group(1)}"') if title else None), levels, True
+
+
+def parse_batch_hints(text):
+    """``{problem_id: {level: hint}}`` from a multi-problem hint answer.
+
+    Takes ``{"results": [{"id": ..., "hints": ...}]}`` or an object keyed by
+    id; problems the answer leaves out (or that cannot be read) are absent.
+    """
+    value = None
+    for snippet in [text, *_snippets(text)]:
+        value = _decode(snippet)
+        if value is not None:
+            break
+    if value is None:
+        return {}
+    results = value.get("results", value)
+    if isinstance(results, dict):
+        results = [dict(item, id=key) for key, item in results.items() if isinstance(item, dict)]
+    answered = {}
+    for item in results if isinstance(results, list) else ():
+        if isinstance(item, dict) and item.get("id") is not None:
+            levels = normalise_levels(item.get("hints"))
+            if levels:
+                answered[str(item["id"])] = levels
+    return answered
+
+
+def missing_levels(hints):
+    return [level for level in HINT_LEVELS if level not in hints]
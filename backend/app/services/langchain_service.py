@@ -1,16 +1,25 @@
-from langchain_google_genai import ChatGoogleGenerativeAI  
-from langchain.prompts import ChatPromptTemplate
-from langchain.chains import LLMChain
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 import os
+from app.services.replay import replay_log
 load_dotenv()
 
 class LangChainService:
-    def __init__(self):
-        self.llm=ChatGoogleGenerativeAI(
-            model="gemini-2.5-flash",
-            temperature=0.3
-        )
+    def __init__(self, llm=None):
+        # llm lets the API pass its provider router instead of a fixed Gemini model
+        if llm is None:
+            def build():
+                # imported here so the API never pays for the Gemini SDK through this module
+                from langchain_google_genai import ChatGoogleGenerativeAI
+
+                return ChatGoogleGenerativeAI(
+                    model="gemini-2.5-flash",
+                    temperature=0.3
+                )
+
+            llm = replay_log.model("google", "gemini-2.5-flash", {"temperature": 0.3}, build)
+        self.llm=llm
         self.hint_chain = self._create_hint_chain()
     def _create_hint_chain(self):
         prompt = ChatPromptTemplate.from_messages([
@@ -25,13 +34,13 @@ class LangChainService:
             """)
         ])
         
-        return LLMChain(llm=self.llm, prompt=prompt)
+        return prompt | self.llm | StrOutputParser()
     
     async def generate_hint(self, problem_data: dict, hint_level: int) -> str:
-        response = await self.hint_chain.arun(
-            title=problem_data["title"],
-            difficulty=problem_data["difficulty"],
-            description=problem_data["description"],
-            hint_level=hint_level
-        )
-        return response    
\ No newline at end of file
+        response = await self.hint_chain.ainvoke({
+            "title": problem_data["title"],
+            "difficulty": problem_data["difficulty"],
+            "description": problem_data["description"],
+            "hint_level": hint_level,
+        })
+        return response
\ No newline at end of file
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import os
+import threading
+
+import httpx
+
+from app.services.replay import replay_log
+from app.services.telemetry import logger
+
+
+def _close_unused(client):
+    """Close an AsyncClient that never sent a request, from sync code on or off the event loop."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(client.aclose())
+    else:
+        loop.create_task(client.aclose())
+
+
+class ModelRegistry:
+    """Long-lived chat models, one per provider/model/parameter combination.
+
+    Models are built on first use (or up front via ``warm``) and reused by
+    every request, so the provider clients keep their connection pools and
+    TLS sessions between calls. Groq models get dedicated httpx clients sized
+    by ``pool_size``/``keepalive``; Gemini models reuse the gRPC channel owned
+    by the shared model instance. Every model goes through ``replay``, which
+    records its calls or replays them instead of building a client.
+    """
+
+    def __init__(self, pool_size=20, keepalive=30.0, http2=False, replay=None):
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.http2 = http2
+        self.replay = replay if replay is not None else replay_log
+        self._models = {}
+        self._clients = []
+        self._lock = threading.Lock()
+        # one lock per model being built, so a slow SDK import only holds up callers of that model
+        self._building = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            pool_size=int(os.getenv("MODEL_POOL_SIZE", "20")),
+            keepalive=float(os.getenv("MODEL_KEEPALIVE", "30")),
+            http2=os.getenv("MODEL_HTTP2", "0") == "1",
+        )
+
+    @staticmethod
+    def make_key(provider, model, params):
+        # params may nest dicts (e.g. Groq ``model_kwargs``), so key on their JSON form
+        return (provider, model, json.dumps(params, sort_keys=True, default=str))
+
+    def get(self, provider, model, **params):
+        key = self.make_key(provider, model, params)
+        instance = self._models.get(key)
+        if instance is not None:
+            return instance
+        with self._lock:
+            building = self._building.setdefault(key, threading.Lock())
+        with building:
+            instance = self._models.get(key)
+            if instance is None:
+                instance = self.replay.model(provider, model, params, lambda: self._build(provider, model, params))
+                self._models[key] = instance
+        return instance
+
+    async def aget(self, provider, model, **params):
+        """``get`` for the event loop: a model that is not built yet (or is being warmed) is waited for in a thread."""
+        instance = self._models.get(self.make_key(provider, model, params))
+        if instance is not None:
+            return instance
+        return await asyncio.to_thread(self.get, provider, model, **params)
+
+    def warm(self, specs):
+        """Build every (provider, model, params) spec, skipping ones that fail."""
+        for provider, model, params in specs:
+            try:
+                self.get(provider, model, **params)
+            except Exception as e:
+                logger.warning("Could not warm %s/%s: %s", provider, model, e)
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=self.pool_size,
+            max_keepalive_connections=self.pool_size,
+            keepalive_expiry=self.keepalive,
+        )
+
+    def _build(self, provider, model, params):
+        if provider == "groq":
+            from langchain_groq import ChatGroq
+
+            http_client = httpx.Client(limits=self._limits(), http2=self.http2)
+            http_async_client = httpx.AsyncClient(limits=self._limits(), http2=self.http2)
+            try:
+                instance = ChatGroq(
+                    model=model,
+                    api_key=os.getenv("GROQ_API_KEY"),
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                    **params,
+                )
+            except Exception:
+                http_client.close()
+                _close_unused(http_async_client)
+                raise
+            self._clients.append((http_client, http_async_client))
+            return instance
+        if provider == "google":
+            from langchain_google_genai import ChatGoogleGenerativeAI
+
+            return ChatGoogleGenerativeAI(model=model, **params)
+        raise ValueError(f"Unknown provider: {provider}")
+
+    async def aclose(self):
+        for http_client, http_async_client in self._clients:
+            http_client.close()
+            await http_async_client.aclose()
+        self._clients = []
+        self._models = {}
+        self._building = {}
+        self.replay.close()
@@ -0,0 +1,120 @@
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+
+
+class PromptRegistry:
+    """Versioned chat prompts, each compiled into a ChatPromptTemplate once.
+
+    ``get(name)`` returns the current version; older versions stay
+    registered so cached results keyed by ``version(name)`` remain valid
+    while a new prompt rolls out.
+    """
+
+    def __init__(self):
+        self._templates = {}
+        self._current = {}
+
+    def register(self, name, version, messages, current=True):
+        self._templates[(name, version)] = ChatPromptTemplate(messages)
+        if current or name not in self._current:
+            self._current[name] = version
+
+    def get(self, name, version=None):
+        return self._templates[(name, version or self._current[name])]
+
+    def version(self, name):
+        return self._current[name]
+
+
+prompts = PromptRegistry()
+
+prompts.register("explain_with_code", "v1", [
+    ('system', """You are a helpful coding assistant. 
+        For greetings, reply briefly and friendly. 
+        For coding questions, provide clear explanations. 
+        Analyze the provided code and give detailed feedback.
+        
+        Problem Context: {problem}"""),
+    MessagesPlaceholder(variable_name='chat_history',optional=True),
+    ('human', 'Question: {question}\n\nCode to analyze:\n{code}')
+])
+
+prompts.register("explain_without_code", "v1", [
+    ('system', """You are a helpful coding assistant. 
+        For greetings, reply briefly and friendly. 
+        For coding questions, provide clear explanations. 
+        Keep responses concise unless detailed help is requested.
+        
+        Problem Context: {problem}"""),
+    MessagesPlaceholder(variable_name='chat_history'),
+    ('human', '{question}')
+])
+
+prompts.register("precheck", "v1", [
+    ('system',"""You are a strict binary classifier.
+           Task: Decide if answering the user’s question requires analyzing the user’s code.
+           Rules:
+           - Output only `1` if the question asks for debugging, fixing, improving, or explaining code.
+           - Output only `0` if the question is general (e.g., greetings, casual chat, theory, definitions, or anything not directly about the code).
+           Answer format: Return only a single character: `1` or `0`. No explanation.
+           """),
+    ('human','{question}')
+])
+
+# shared by the full hint prompt and the re-ask for missing levels
+_HINT_TUTOR = (
+    "You are a helpful coding tutor. "
+    "Provide a progressive hint for a programming problem based on the requested hint level. "
+    "Never give away the full solution. "
+    "Hint levels: "
+    "1 = Give a conceptual hint about the general approach or pattern needed. Don't mention specific algorithms or data structures yet. Focus on the key insight that leads to the solution. "
+    "2 = Suggest the specific algorithm, data structure, or technique to use. Explain why this approach is suitable for this problem type. "
+    "3 = Provide a step-by-step outline of the solution approach. Break down the algorithm into clear steps without giving code. "
+    "4 = Give implementation hints including edge cases to consider, time/space complexity, and common pitfalls to avoid."
+)
+
+prompts.register("hint", "v1", [
+    ("system",
+        _HINT_TUTOR +
+        "Respond ONLY with a valid JSON object in this format: "
+        '{{"problem_title": "<title>", "hints": {{"1": "<hint1>", "2": "<hint2>", "3": "<hint3>", "4": "<hint4>"}}}}'
+    ),
+    ("human",""" 
+Problem Titile: {title}
+Difficulty: {difficulty}
+Description: {description}
+
+
+Give all level hints for this problem level 1,2,3,4
+""")
+])
+
+prompts.register("hint_missing", "v1", [
+    ("system",
+        _HINT_TUTOR +
+        " Respond ONLY with a valid JSON object containing exactly the requested levels, in this format: "
+        '{{"hints": {{"<level>": "<hint>"}}}}'
+    ),
+    ("human","""
+Problem Title: {title}
+Difficulty: {difficulty}
+Description: {description}
+
+Hints already given: {given}
+
+Give only the hints for levels {levels}
+""")
+])
+
+prompts.register("hint_batch", "v1", [
+    ("system",
+        _HINT_TUTOR +
+        " You will be given several problems, each with an id. "
+        "Respond ONLY with a valid JSON object with one entry per problem, in this format: "
+        '{{"results": [{{"id": "<id>", "hints": {{"1": "<hint1>", "2": "<hint2>", "3": "<hint3>", "4": "<hint4>"}}}}]}}'
+    ),
+    ("human","""
+{problems}
+
+Give all level hints 1,2,3,4 for every problem above
+""")
+])
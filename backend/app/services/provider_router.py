@@ -0,0 +1,309 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from langchain_core.runnables import Runnable
+
+from app.services.admission import Overloaded
+from app.services.telemetry import logger, telemetry, usage_of
+
+
+class NoProviderAvailable(RuntimeError):
+    """Every candidate's half-open trial was taken by a concurrent call."""
+
+
+class ProviderHealth:
+    """Rolling latency/error window and circuit breaker for one provider model."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, window=100, failure_threshold=5, error_rate_threshold=0.5, reset_timeout=30.0):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.consecutive_failures = 0
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    def _allows(self, now):
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return now - self.opened_at >= self.reset_timeout
+        # a single trial request (again, if the last one never reported)
+        return self._trial_started is None or now - self._trial_started >= self.reset_timeout
+
+    def can_try(self):
+        """Whether a call would be let through, without taking the half-open trial."""
+        with self._lock:
+            return self._allows(time.monotonic())
+
+    def acquire(self):
+        """Let a call through: always while closed, once per trial while half-open."""
+        with self._lock:
+            now = time.monotonic()
+            if not self._allows(now):
+                return False
+            if self.state != self.CLOSED:
+                self.state = self.HALF_OPEN
+                self._trial_started = now
+            return True
+
+    def record_success(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.state = self.CLOSED
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._lock:
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold or (
+                len(self.outcomes) >= 10 and self._error_rate() >= self.error_rate_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_started = None
+
+    def _error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def percentile(self, q):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+    def snapshot(self):
+        p50, p95 = self.percentile(0.5), self.percentile(0.95)
+        return {
+            "state": self.state,
+            "error_rate": round(self._error_rate(), 3),
+            "p50": round(p50, 3) if p50 is not None else None,
+            "p95": round(p95, 3) if p95 is not None else None,
+            "samples": len(self.outcomes),
+        }
+
+
+class HealthBoard:
+    """ProviderHealth per provider model, shared by every router."""
+
+    def __init__(self, **health_kwargs):
+        self.health_kwargs = health_kwargs
+        self._providers = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            failure_threshold=int(os.getenv("ROUTER_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("ROUTER_RESET_TIMEOUT", "30")),
+        )
+
+    def __getitem__(self, name):
+        with self._lock:
+            if name not in self._providers:
+                self._providers[name] = ProviderHealth(**self.health_kwargs)
+            return self._providers[name]
+
+    def snapshot(self):
+        with self._lock:
+            return {name: health.snapshot() for name, health in self._providers.items()}
+
+
+class ProviderRouter(Runnable):
+    """Chat-model runnable that routes each call over an ordered list of providers.
+
+    Providers whose breaker is open are skipped, failures fail over to the
+    next provider, and with ``hedge`` a call that is still running after the
+    primary's p95 latency (at least ``hedge_min_delay``) is duplicated on the
+    next provider; the first success wins and the loser is cancelled.
+    ``routes`` are ``(provider, model, params)`` specs resolved through the
+    model registry, so a provider that cannot even be built counts as failed.
+    ``limiters`` optionally maps a route name to a TokenBucket awaited before
+    each call to that provider. With ``admission`` every call also holds a
+    slot of its provider's concurrency cap; a provider whose queue is full
+    is failed over without counting against its breaker.
+    """
+
+    def __init__(self, registry, routes, board, hedge=False, hedge_min_delay=2.0, hedge_default_delay=8.0,
+                 admission=None):
+        self.registry = registry
+        self.routes = routes
+        self.board = board
+        self.admission = admission
+        self.hedge = hedge
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.hedges = 0
+        self.limiters = {}
+
+    @staticmethod
+    def route_name(route):
+        provider, model, _ = route
+        return f"{provider}:{model}"
+
+    def _candidates(self):
+        """Routes whose breaker would let a call through, and whether breakers are being ignored."""
+        ready = [r for r in self.routes if self.board[self.route_name(r)].can_try()]
+        # every breaker open: still try them all rather than fail outright
+        return (ready, False) if ready else (list(self.routes), True)
+
+    def _claim(self, route, forced):
+        # the half-open trial is only taken by a route that is actually called
+        return self.board[self.route_name(route)].acquire() or forced
+
+    def _hedge_delay(self, route):
+        p95 = self.board[self.route_name(route)].percentile(0.95)
+        if p95 is None:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, p95)
+
+    def _model(self, route):
+        provider, model, params = route
+        return self.registry.get(provider, model, **params)
+
+    async def _amodel(self, route):
+        provider, model, params = route
+        return await self.registry.aget(provider, model, **params)
+
+    def _slot(self, route):
+        return self.admission.slot(route[0]) if self.admission is not None else nullcontext()
+
+    async def _call(self, route, input, config, **kwargs):
+        name = self.route_name(route)
+        if name in self.limiters:
+            await self.limiters[name].acquire()
+        health = self.board[name]
+        async with self._slot(route):
+            start = time.perf_counter()
+            try:
+                result = await (await self._amodel(route)).ainvoke(input, config, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                health.record_failure()
+                telemetry.observe_provider(name, time.perf_counter() - start, ok=False)
+                raise
+        elapsed = time.perf_counter() - start
+        health.record_success(elapsed)
+        telemetry.observe_provider(name, elapsed, usage=usage_of(result))
+        return result
+
+    def invoke(self, input, config=None, **kwargs):
+        error = None
+        routes, forced = self._candidates()
+        for route in routes:
+            if not self._claim(route, forced):
+                continue
+            name = self.route_name(route)
+            health = self.board[name]
+            start = time.perf_counter()
+            try:
+                result = self._model(route).invoke(input, config, **kwargs)
+            except Exception as e:
+                health.record_failure()
+                telemetry.observe_provider(name, time.perf_counter() - start, ok=False)
+                error = e
+                continue
+            elapsed = time.perf_counter() - start
+            health.record_success(elapsed)
+            telemetry.observe_provider(name, elapsed, usage=usage_of(result))
+            return result
+        raise error or NoProviderAvailable("No provider available")
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        queue, forced = self._candidates()
+        pending = {}
+        errors = []
+
+        def launch():
+            while queue:
+                route = queue.pop(0)
+                if self._claim(route, forced):
+                    pending[asyncio.ensure_future(self._call(route, input, config, **kwargs))] = route
+                    return True
+            return False
+
+        launch()
+        hedged = False
+        try:
+            while pending:
+                timeout = None
+                if self.hedge and not hedged and queue:
+                    timeout = self._hedge_delay(next(iter(pending.values())))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    hedged = True
+                    if launch():
+                        self.hedges += 1
+                    continue
+                for task in done:
+                    route = pending.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    if isinstance(task.exception(), Overloaded):
+                        logger.warning("Provider %s overloaded", self.route_name(route))
+                    else:
+                        logger.warning("Provider %s failed: %s", self.route_name(route), task.exception())
+                    errors.append(task.exception())
+                if not pending and queue:
+                    launch()
+            raise errors[-1] if errors else NoProviderAvailable("No provider available")
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def astream(self, input, config=None, **kwargs):
+        error = None
+        routes, forced = self._candidates()
+        for route in routes:
+            if not self._claim(route, forced):
+                continue
+            name = self.route_name(route)
+            if name in self.limiters:
+                await self.limiters[name].acquire()
+            health = self.board[name]
+            ttft = None
+            usage = {}
+            try:
+                async with self._slot(route):
+                    start = time.perf_counter()
+                    try:
+                        model = await self._amodel(route)
+                        async for chunk in model.astream(input, config, **kwargs):
+                            if ttft is None:
+                                ttft = time.perf_counter() - start
+                            for kind, count in (usage_of(chunk) or {}).items():
+                                if isinstance(count, int):
+                                    usage[kind] = usage.get(kind, 0) + count
+                            yield chunk
+                    except Exception as e:
+                        health.record_failure()
+                        telemetry.observe_provider(name, time.perf_counter() - start, ok=False, ttft=ttft)
+                        if ttft is not None:
+                            # tokens already went out, can't switch provider mid-answer
+                            raise
+                        logger.warning("Provider %s failed: %s", name, e)
+                        error = e
+                        continue
+            except Overloaded as e:
+                logger.warning("Provider %s overloaded", name)
+                error = e
+                continue
+            elapsed = time.perf_counter() - start
+            health.record_success(elapsed)
+            telemetry.observe_provider(name, elapsed, ttft=ttft, usage=usage)
+            return
+        raise error or NoProviderAvailable("No provider available")
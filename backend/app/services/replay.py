@@ -0,0 +1,285 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.services.telemetry import logger
+
+REDACTED = "[REDACTED]"
+# Groq, Google and OpenAI-style keys and bearer tokens, wherever they appear in a prompt
+SECRET_PATTERN = re.compile(
+    r"gsk_[A-Za-z0-9]{20,}|AIza[0-9A-Za-z_\-]{35}|sk-[A-Za-z0-9_\-]{20,}|(?i:bearer\s+)[A-Za-z0-9._\-]{16,}"
+)
+SECRET_PARAMS = {"api_key", "google_api_key", "groq_api_key", "credentials", "http_client", "http_async_client"}
+
+
+class ReplayMiss(LookupError):
+    """Replay mode was asked for a prompt that is not in the log."""
+
+
+class ReplayedError(RuntimeError):
+    """A provider error, served back from the log as it was recorded."""
+
+
+def redact(text):
+    for name, value in os.environ.items():
+        if len(value) >= 8 and name.endswith(("_API_KEY", "_TOKEN", "_SECRET")):
+            text = text.replace(value, REDACTED)
+    return SECRET_PATTERN.sub(REDACTED, text)
+
+
+def _text(content):
+    return content if isinstance(content, str) else json.dumps(content, sort_keys=True, default=str)
+
+
+def _redact_json(value):
+    return None if value is None else json.loads(redact(json.dumps(value, default=str)))
+
+
+def _redact_chunks(chunks):
+    redacted = [[at, redact(text)] for at, text in chunks]
+    whole = "".join(text for _, text in redacted)
+    if chunks and redact(whole) != whole:
+        # a secret split across chunks is only caught on the joined answer
+        return [[chunks[-1][0], redact(whole)]]
+    return redacted
+
+
+def prompt_messages(messages):
+    return [[message.type, redact(_text(message.content))] for message in messages]
+
+
+def prompt_key(messages):
+    raw = json.dumps(prompt_messages(messages), separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class ReplayLog:
+    """Record and replay of chat model calls through a JSON-lines log.
+
+    In ``record`` mode every model is wrapped so its prompts, answer chunks
+    with their timing, token usage and errors are appended to ``path``
+    (gzipped when it ends in ``.gz``) with API keys redacted. In ``replay``
+    mode calls are served from the log without building any provider
+    client, at the recorded timing divided by ``speed`` (0 for no delays).
+    Calls are matched on their prompt messages only, so a recorded failover
+    replays as the same error followed by the same answer; a prompt
+    recorded several times is served its recordings in turn.
+    """
+
+    MODES = ("off", "record", "replay")
+
+    def __init__(self, path="replay.jsonl.gz", mode="off", speed=1.0):
+        if mode not in self.MODES:
+            raise ValueError(f"REPLAY_MODE must be one of {', '.join(self.MODES)}, not {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        self._entries = None
+        self._cursor = {}
+        self._file = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            path=os.getenv("REPLAY_PATH", "replay.jsonl.gz"),
+            mode=os.getenv("REPLAY_MODE", "off"),
+            speed=float(os.getenv("REPLAY_SPEED", "1")),
+        )
+
+    def model(self, provider, model, params, build):
+        """The chat model for a route: ``build()``, recorded, or replayed from the log."""
+        if self.mode == "replay":
+            self._load()
+            return ReplayChatModel(log=self, provider=provider, model_id=model)
+        instance = build()
+        if self.mode == "record":
+            params = {key: value for key, value in params.items() if key not in SECRET_PARAMS}
+            return RecordingChatModel(inner=instance, log=self, provider=provider, model_id=model, params=params)
+        return instance
+
+    def _open(self, mode):
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, mode, encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def append(self, entry):
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = self._open("at")
+            self._file.write(line)
+            # a sync flush, so a log cut off by a crash is still readable up to here
+            self._file.flush()
+            self.recorded += 1
+
+    def _load(self):
+        with self._lock:
+            if self._entries is not None:
+                return
+            self._entries = {}
+            try:
+                with self._open("rt") as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        self._entries.setdefault(entry["key"], []).append(entry)
+            except FileNotFoundError:
+                logger.warning("Replay log %s not found, every call will miss", self.path)
+            except (EOFError, json.JSONDecodeError):
+                logger.warning("Replay log %s is truncated, using the calls before the cut", self.path)
+            logger.info("Replaying %d prompts from %s", len(self._entries), self.path)
+
+    def lookup(self, messages):
+        self._load()
+        key = prompt_key(messages)
+        with self._lock:
+            recorded = self._entries.get(key)
+            if not recorded:
+                self.misses += 1
+                raise ReplayMiss(f"No recorded call for prompt {key} in {self.path}")
+            turn = self._cursor.get(key, 0)
+            self._cursor[key] = turn + 1
+            self.replayed += 1
+        return recorded[turn % len(recorded)]
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def snapshot(self):
+        return {"mode": self.mode, "recorded": self.recorded, "replayed": self.replayed, "misses": self.misses}
+
+
+class RecordingChatModel(BaseChatModel):
+    """Passes calls through to ``inner`` and appends each one to the log."""
+
+    inner: object
+    log: object
+    provider: str
+    model_id: str
+    params: dict = {}
+
+    @property
+    def _llm_type(self):
+        return "recording"
+
+    def _record(self, messages, start, chunks, message=None, error=None):
+        self.log.append({
+            "key": prompt_key(messages),
+            "provider": self.provider,
+            "model": self.model_id,
+            "params": self.params,
+            "messages": prompt_messages(messages),
+            "chunks": _redact_chunks(chunks),
+            "seconds": round(time.perf_counter() - start, 4),
+            "usage": getattr(message, "usage_metadata", None),
+            "metadata": _redact_json(getattr(message, "response_metadata", None)),
+            "error": f"{type(error).__name__}: {redact(str(error))}" if error is not None else None,
+        })
+
+    def _result(self, messages, start, message):
+        self._record(messages, start, [[round(time.perf_counter() - start, 4), _text(message.content)]], message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            message = self.inner.invoke(messages, stop=stop, **kwargs)
+        except Exception as e:
+            self._record(messages, start, [], error=e)
+            raise
+        return self._result(messages, start, message)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            message = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+        except Exception as e:
+            self._record(messages, start, [], error=e)
+            raise
+        return self._result(messages, start, message)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        start = time.perf_counter()
+        chunks, merged = [], None
+        try:
+            async for chunk in self.inner.astream(messages, stop=stop, **kwargs):
+                chunks.append([round(time.perf_counter() - start, 4), _text(chunk.content)])
+                merged = chunk if merged is None else merged + chunk
+                yield ChatGenerationChunk(message=chunk)
+        except Exception as e:
+            self._record(messages, start, chunks, merged, error=e)
+            raise
+        self._record(messages, start, chunks, merged)
+
+
+class ReplayChatModel(BaseChatModel):
+    """Serves recorded answers, usage and errors for the prompts it is given."""
+
+    log: object
+    provider: str
+    model_id: str
+
+    @property
+    def _llm_type(self):
+        return "replay"
+
+    def _delay(self, seconds):
+        return seconds / self.log.speed if self.log.speed > 0 else 0
+
+    @staticmethod
+    def _message(entry):
+        return AIMessage(
+            content="".join(text for _, text in entry["chunks"]),
+            usage_metadata=entry.get("usage"),
+            response_metadata=entry.get("metadata") or {},
+        )
+
+    @staticmethod
+    def _raise_if_failed(entry):
+        if entry.get("error"):
+            raise ReplayedError(entry["error"])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        entry = self.log.lookup(messages)
+        time.sleep(self._delay(entry["seconds"]))
+        self._raise_if_failed(entry)
+        return ChatResult(generations=[ChatGeneration(message=self._message(entry))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        entry = self.log.lookup(messages)
+        await asyncio.sleep(self._delay(entry["seconds"]))
+        self._raise_if_failed(entry)
+        return ChatResult(generations=[ChatGeneration(message=self._message(entry))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        entry = self.log.lookup(messages)
+        previous, last = 0.0, len(entry["chunks"]) - 1
+        for i, (at, text) in enumerate(entry["chunks"]):
+            await asyncio.sleep(self._delay(at - previous))
+            previous = at
+            final = i == last and not entry.get("error")
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content=text,
+                usage_metadata=entry.get("usage") if final else None,
+                response_metadata=(entry.get("metadata") or {}) if final else {},
+            ))
+        await asyncio.sleep(self._delay(entry["seconds"] - previous))
+        self._raise_if_failed(entry)
+
+
+replay_log = ReplayLog.from_env()
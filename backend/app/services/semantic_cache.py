@@ -0,0 +1,145 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# function words, auxiliaries and politeness that do not change what is asked
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "am", "was", "be", "of", "to", "in", "for", "on", "and", "or", "i", "me", "my",
+    "this", "that", "it", "there", "here", "please", "can", "could", "would", "will", "should", "do", "you", "give",
+    "tell", "any", "some", "with", "about", "most", "very", "really", "just",
+}
+# contractions with the apostrophe dropped, and wh-words that ask the same thing
+_NORMAL = {"whats": "what", "which": "what", "hows": "how", "whys": "why", "wheres": "where", "does": "do", "did": "do"}
+# follow-ups whose meaning depends on the previous turns
+_FOLLOW_UP_RE = re.compile(r"^\s*(and|but|so|also|then|why|what about|how about|more|again|it|that|this|those|these)\b", re.IGNORECASE)
+
+
+def _words(text):
+    words = []
+    for word in _WORD_RE.findall(text.lower().replace("'", "")):
+        word = _NORMAL.get(word, word)
+        if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+            word = word[:-1]  # plural
+        if word not in _STOPWORDS:
+            words.append(word)
+    return words
+
+
+def embed(text, dim=512):
+    """Hashed embedding of content words, ordered word pairs and character trigrams, L2-normalised.
+
+    Words are normalised (contractions, plurals, filler words) so paraphrases
+    land close together; ordered pairs of nearby words keep "BFS better than
+    DFS" apart from its reverse; light trigrams absorb typos. Entirely local:
+    no model download, stable across processes. ``bench.semantic_threshold``
+    calibrates the hit threshold on labelled question pairs.
+    """
+    vec = np.zeros(dim, dtype=np.float32)
+    words = _words(text)
+    features = [(w, 1.0) for w in words]
+    features += [(f"{a}>{b}", 1.0) for i, a in enumerate(words) for b in words[i + 1 : i + 3]]
+    for w in words:
+        padded = f"#{w}#"
+        features += [(padded[i : i + 3], 0.2) for i in range(len(padded) - 2)]
+    for feature, weight in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+        vec[h % dim] += weight if (h >> 63) & 1 else -weight
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+class _ProblemIndex:
+    """Question vectors and answers for one problem."""
+
+    def __init__(self, dim, max_entries):
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.answers = []
+        self.created = []
+        self.max_entries = max_entries
+
+    def search(self, vec):
+        if not self.answers:
+            return None, 0.0
+        scores = self.vectors @ vec
+        i = int(np.argmax(scores))
+        return i, float(scores[i])
+
+    def add(self, vec, answer):
+        if len(self.answers) >= self.max_entries:
+            # drop the oldest tenth at once so the matrix is copied rarely
+            drop = max(1, self.max_entries // 10)
+            self.vectors = self.vectors[drop:]
+            del self.answers[:drop]
+            del self.created[:drop]
+        self.vectors = np.vstack([self.vectors, vec[None, :]])
+        self.answers.append(answer)
+        self.created.append(time.time())
+
+
+class SemanticCache:
+    """Answers to general (no-code) chat questions, looked up by question similarity.
+
+    One index per problem; brute-force cosine similarity over a NumPy matrix,
+    which at ``max_per_problem`` rows is a single small matrix-vector product,
+    so there is no ANN index. Entries older than ``ttl`` are ignored, each problem keeps at most
+    ``max_per_problem`` entries and the least recently used problems are
+    evicted beyond ``max_problems``.
+    """
+
+    def __init__(self, threshold=0.75, ttl=7 * 24 * 3600, max_problems=2000, max_per_problem=200, dim=512):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_problems = max_problems
+        self.max_per_problem = max_per_problem
+        self.dim = dim
+        self._problems = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.75")),
+            ttl=int(os.getenv("SEMANTIC_CACHE_TTL", str(7 * 24 * 3600))),
+            max_problems=int(os.getenv("SEMANTIC_CACHE_MAX_PROBLEMS", "2000")),
+            max_per_problem=int(os.getenv("SEMANTIC_CACHE_MAX_PER_PROBLEM", "200")),
+        )
+
+    @staticmethod
+    def cacheable(question):
+        """Self-contained questions only; short or referential follow-ups depend on history."""
+        return len(_WORD_RE.findall(question)) >= 3 and not _FOLLOW_UP_RE.match(question)
+
+    def get(self, problem_key, question):
+        vec = embed(question, self.dim)
+        with self._lock:
+            index = self._problems.get(problem_key)
+            if index is not None:
+                self._problems.move_to_end(problem_key)
+                i, score = index.search(vec)
+                if i is not None and score >= self.threshold and time.time() - index.created[i] <= self.ttl:
+                    self.hits += 1
+                    return index.answers[i]
+            self.misses += 1
+            return None
+
+    def set(self, problem_key, question, answer):
+        vec = embed(question, self.dim)
+        with self._lock:
+            index = self._problems.get(problem_key)
+            if index is None:
+                index = self._problems[problem_key] = _ProblemIndex(self.dim, self.max_per_problem)
+                while len(self._problems) > self.max_problems:
+                    self._problems.popitem(last=False)
+            self._problems.move_to_end(problem_key)
+            index.add(vec, answer)
+
+    def __len__(self):
+        return sum(len(index.answers) for index in self._problems.values())
@@ -0,0 +1,90 @@
+import hashlib
+import json
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import APIRoute
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # optional; gzip only
+    BrotliMiddleware = None
+
+# default response class for the API
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+
+def dumps(data):
+    """Compact JSON text, encoded with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, separators=(",", ":"))
+
+
+def loads(raw):
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+class FastJSONRequest(Request):
+    """Request whose JSON body is decoded with ``loads``."""
+
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class FastJSONRoute(APIRoute):
+    """Route class that hands FastAPI a ``FastJSONRequest`` to validate bodies from."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request):
+            return await handler(FastJSONRequest(request.scope, request.receive))
+
+        return route_handler
+
+
+def etag(data):
+    """Weak ETag of a JSON-serialisable value (weak, so it survives compression)."""
+    digest = hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def etag_matches(if_none_match, tag):
+    """Weak comparison of an If-None-Match header against ``tag``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = tag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == opaque for candidate in if_none_match.split(","))
+
+
+class CompressionMiddleware:
+    """Brotli (when brotli-asgi is installed) or gzip for responses over ``minimum_size`` bytes.
+
+    Paths ending in one of ``skip_suffixes`` bypass compression: those
+    endpoints stream SSE or NDJSON, and a compressor would hold events back
+    until its buffer fills.
+    """
+
+    def __init__(self, app, minimum_size=1000, skip_suffixes=("/stream", "/batch")):
+        self.app = app
+        self.skip_suffixes = tuple(skip_suffixes)
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].endswith(self.skip_suffixes):
+            return await self.compressed(scope, receive, send)
+        await self.app(scope, receive, send)
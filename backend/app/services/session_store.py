@@ -0,0 +1,129 @@
+import os
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.services.context_packing import count_tokens, first_sentence
+from app.services.shared_state import SharedState
+
+
+class ChatSession:
+    """Problem/code context stored once, plus the running conversation."""
+
+    def __init__(self, session_id, problem, code=""):
+        self.id = session_id
+        self.problem = problem
+        self.problem_id = None
+        self.code = code
+        self.messages = []  # (sender, text), sender is "user" or "ai"
+        self.summary = ""
+        # the code as of the last answer that analysed it, and that answer's index in messages
+        self.analyzed_code = None
+        self.analyzed_index = None
+        self.updated_at = time.time()
+
+    def add(self, sender, text):
+        self.messages.append((sender, text))
+        self.updated_at = time.time()
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "problem": self.problem,
+            "problem_id": self.problem_id,
+            "code": self.code,
+            "messages": [list(message) for message in self.messages],
+            "summary": self.summary,
+            "analyzed_code": self.analyzed_code,
+            "analyzed_index": self.analyzed_index,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        session = cls(data["id"], data["problem"], data["code"])
+        session.problem_id = data["problem_id"]
+        session.messages = [tuple(message) for message in data["messages"]]
+        session.summary = data["summary"]
+        session.analyzed_code = data.get("analyzed_code")
+        session.analyzed_index = data.get("analyzed_index")
+        session.updated_at = data["updated_at"]
+        return session
+
+    def mark_analyzed(self, code):
+        """Record that the latest answer analysed ``code``."""
+        self.analyzed_code = code
+        self.analyzed_index = len(self.messages) - 1
+
+    def history(self, token_budget):
+        """Chat messages for the prompt, newest first to fit ``token_budget``.
+
+        Turns that no longer fit are folded into ``summary`` (one sentence per
+        turn) and dropped from the session, so the stored history stays bounded.
+        """
+        kept, used = [], 0
+        for sender, text in reversed(self.messages):
+            cost = count_tokens(text)
+            if kept and used + cost > token_budget:
+                break
+            kept.append((sender, text))
+            used += cost
+        kept.reverse()
+
+        dropped = self.messages[: len(self.messages) - len(kept)]
+        if dropped:
+            lines = [f"{'User' if s == 'user' else 'Assistant'}: {first_sentence(t)}" for s, t in dropped]
+            self.summary = "\n".join(([self.summary] if self.summary else []) + lines)
+            # keep the summary itself within a quarter of the budget
+            while count_tokens(self.summary) > token_budget // 4 and "\n" in self.summary:
+                self.summary = self.summary.split("\n", 1)[1]
+            self.messages = kept
+            if self.analyzed_index is not None:
+                self.analyzed_index -= len(dropped)
+                if self.analyzed_index < 0:
+                    # the analysis has been summarised away, so the next code turn sends the code in full
+                    self.analyzed_code = self.analyzed_index = None
+
+        history = []
+        if self.summary:
+            history.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for sender, text in kept:
+            history.append(AIMessage(content=text) if sender == "ai" else HumanMessage(content=text))
+        return history
+
+
+class SessionStore:
+    """Chat sessions in shared state, with idle expiry and a size cap.
+
+    Sessions are loaded per request and written back with ``save`` after
+    they change, so any worker can continue any conversation.
+    """
+
+    def __init__(self, state=None, ttl=6 * 3600, max_sessions=10000, history_tokens=1500):
+        self.ttl = ttl
+        self.history_tokens = history_tokens
+        self.table = (state or SharedState()).table("session", max_entries=max_sessions)
+
+    @classmethod
+    def from_env(cls, state=None):
+        return cls(
+            state=state,
+            ttl=int(os.getenv("SESSION_TTL", str(6 * 3600))),
+            max_sessions=int(os.getenv("SESSION_MAX", "10000")),
+            history_tokens=int(os.getenv("SESSION_HISTORY_TOKENS", "1500")),
+        )
+
+    async def get(self, session_id):
+        data = await self.table.get(session_id)
+        return ChatSession.from_dict(data) if data is not None else None
+
+    def create(self, problem, code=""):
+        """A new session; it is stored on the first ``save``."""
+        return ChatSession(uuid.uuid4().hex, problem, code)
+
+    async def save(self, session):
+        await self.table.set(session.id, session.to_dict(), ttl=self.ttl)
+
+    async def size(self):
+        return await self.table.size()
@@ -0,0 +1,145 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.rate_limit import TokenBucket
+
+
+class MemoryTable:
+    """One namespace of the in-process backend: LRU-capped, per-entry expiry.
+
+    Values are stored as given (no serialisation), so callers must not rely
+    on mutations of a returned value being visible without ``set``.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    async def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    async def set(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl if ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    async def take(self, key, rate, capacity):
+        """Take one token from the bucket at ``key``; 0 if granted, else seconds to wait."""
+        bucket = await self.get(key)
+        if bucket is None:
+            bucket = TokenBucket(rate, capacity)
+            await self.set(key, bucket)
+        return bucket.try_acquire()
+
+    async def size(self):
+        return len(self._entries)
+
+
+# refill and take one token atomically; returns the wait in seconds as a string
+_TAKE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisTable:
+    """One namespace of the Redis backend; values are stored as JSON."""
+
+    def __init__(self, client, prefix):
+        self.client = client
+        self.prefix = prefix
+        self._take = client.register_script(_TAKE_SCRIPT)
+
+    async def get(self, key):
+        raw = await self.client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key, value, ttl=None):
+        await self.client.set(self.prefix + key, json.dumps(value), ex=int(ttl) if ttl else None)
+
+    async def delete(self, key):
+        await self.client.delete(self.prefix + key)
+
+    async def take(self, key, rate, capacity):
+        wait = await self._take(keys=[self.prefix + key], args=[rate, capacity, time.time()])
+        return float(wait)
+
+    async def size(self):
+        count = 0
+        async for _ in self.client.scan_iter(match=self.prefix + "*", count=1000):
+            count += 1
+        return count
+
+
+class SharedState:
+    """State shared by every worker: sessions, rate-limit buckets and the like.
+
+    ``table(name)`` returns a namespace with async ``get``/``set``/``delete``,
+    a token-bucket ``take`` and ``size``. The memory backend only shares
+    within one process; point ``SHARED_STATE_URL`` at Redis to share between
+    workers and hosts.
+    """
+
+    def __init__(self, url="memory"):
+        self.url = url
+        self.client = None
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            import redis.asyncio as aioredis
+
+            self.client = aioredis.from_url(url)
+        elif url != "memory":
+            raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+        self._tables = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv("SHARED_STATE_URL", "memory"))
+
+    @property
+    def redis_url(self):
+        return self.url if self.client is not None else None
+
+    def table(self, name, max_entries=10000):
+        if name not in self._tables:
+            if self.client is not None:
+                self._tables[name] = RedisTable(self.client, f"lcai:{name}:")
+            else:
+                self._tables[name] = MemoryTable(max_entries)
+        return self._tables[name]
+
+    async def ping(self):
+        if self.client is not None:
+            await self.client.ping()
+
+    async def aclose(self):
+        if self.client is not None:
+            await self.client.aclose()
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import uuid
+
+from app.services.telemetry import logger
+
+# delete the lock only while it still holds our token, in one round trip
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Shares one in-flight call between concurrent callers with the same key.
+
+    Within a process, followers await the leader's task. With a Redis URL,
+    workers also coordinate through a short-lived ``SET NX`` lock: a worker
+    that loses the lock polls ``check`` (usually a shared cache read) until
+    the winner has published a result, and computes it itself only if the
+    lock disappears or ``wait_timeout`` passes.
+    """
+
+    def __init__(self, redis_url=None, lock_ttl=90, wait_timeout=60, poll_interval=0.2, client=None):
+        self._calls = {}
+        self.redis = client
+        if redis_url and client is None:
+            import redis.asyncio as aioredis
+
+            self.redis = aioredis.Redis.from_url(redis_url)
+        self._release_lock = self.redis.register_script(_RELEASE_SCRIPT) if self.redis is not None else None
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.leaders = 0
+        self.shared = 0
+
+    @classmethod
+    def from_env(cls, default_redis_url=None):
+        return cls(redis_url=os.getenv("SINGLEFLIGHT_REDIS_URL") or default_redis_url)
+
+    def in_flight(self, key):
+        return key in self._calls
+
+    async def do(self, key, fn, check=None):
+        """Return ``await fn()``, sharing the call with concurrent callers of ``key``."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.shared += 1
+            return await asyncio.shield(task)
+        task = asyncio.ensure_future(self._lead(key, fn, check))
+        self._calls[key] = task
+        task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _lead(self, key, fn, check):
+        if self.redis is None or check is None:
+            self.leaders += 1
+            return await fn()
+
+        lock_key = f"singleflight:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self.redis.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except Exception as e:
+            logger.warning("Single-flight lock unavailable: %s", e)
+            acquired = True
+            token = None
+        if not acquired:
+            result = await self._wait_for(lock_key, check)
+            if result is not None:
+                self.shared += 1
+                return result
+        self.leaders += 1
+        try:
+            return await fn()
+        finally:
+            if acquired and token is not None:
+                await self._release(lock_key, token)
+
+    async def _wait_for(self, lock_key, check):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        while loop.time() < deadline:
+            result = await check()
+            if result is not None:
+                return result
+            if not await self.redis.exists(lock_key):
+                return await check()
+            await asyncio.sleep(self.poll_interval)
+        return None
+
+    async def _release(self, lock_key, token):
+        try:
+            await self._release_lock(keys=[lock_key], args=[token])
+        except Exception as e:
+            logger.warning("Single-flight unlock failed: %s", e)
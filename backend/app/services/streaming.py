@@ -0,0 +1,35 @@
+import json
+import re
+
+from app.services.serialization import dumps
+
+# a hint level whose string value has been closed, e.g. "2": "Use a hash map..."
+_LEVEL_RE = re.compile(r'"([1-4])"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def sse(event, data):
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+def ndjson(data):
+    """Format one newline-delimited JSON record."""
+    return dumps(data) + "\n"
+
+
+def extract_hint_levels(text):
+    """Return the hint levels that are complete in a partial JSON answer.
+
+    The model streams ``{"problem_title": ..., "hints": {"1": ..., ...}}``;
+    a level is complete once its string value has been closed.
+    """
+    hints_at = text.find('"hints"')
+    if hints_at == -1:
+        return {}
+    levels = {}
+    for match in _LEVEL_RE.finditer(text, hints_at):
+        try:
+            levels[int(match.group(1))] = json.loads(f'"{match.group(2)}"')
+        except json.JSONDecodeError:
+            continue
+    return levels
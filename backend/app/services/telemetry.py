@@ -0,0 +1,286 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    import prometheus_client
+except ImportError:  # fall back to the minimal exposition below
+    prometheus_client = None
+
+logger = logging.getLogger("leetcode_ai")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def setup_logging(level="INFO"):
+    """Log through a background thread so request handlers never block on stderr.
+
+    Leaves logging alone when the root logger is already configured
+    (e.g. by ``uvicorn --log-config``).
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+    records = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(records, handler)
+    root.addHandler(logging.handlers.QueueHandler(records))
+    root.setLevel(level)
+    # provider SDKs log every HTTP call at INFO
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    """Counter or histogram with the prometheus_client ``labels(...)`` interface,
+    used when prometheus_client is not installed."""
+
+    def __init__(self, kind, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        return _Child(self, tuple(str(v) for v in values))
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, list(value) if self.kind == "histogram" else value) for key, value in self._values.items())
+        for key, value in items:
+            base = list(zip(self.labelnames, key))
+            if self.kind == "counter":
+                lines.append(f"{self.name}_total{_labels(base)} {value}")
+                continue
+            *counts, total, count = value
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(base + [('le', bound)])} {n}")
+            lines.append(f"{self.name}_bucket{_labels(base + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(base)} {total}")
+            lines.append(f"{self.name}_count{_labels(base)} {count}")
+        return lines
+
+
+class _Child:
+    def __init__(self, metric, key):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount=1):
+        with self.metric._lock:
+            self.metric._values[self.key] = self.metric._values.get(self.key, 0) + amount
+
+    def observe(self, value):
+        metric = self.metric
+        with metric._lock:
+            # cumulative bucket counts, then sum and count
+            state = metric._values.setdefault(self.key, [0] * len(metric.buckets) + [0.0, 0])
+            for i, bound in enumerate(metric.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+
+class Telemetry:
+    """Stage timings, provider latency and token counts, exported on ``/metrics``.
+
+    Uses prometheus_client when it is installed and a small built-in text
+    exposition otherwise. With ``otel`` every stage is also an OpenTelemetry
+    span (exporters are configured by the OpenTelemetry SDK, not here).
+    Request and response bodies are only logged for a ``log_sample_rate``
+    fraction of calls.
+    """
+
+    def __init__(self, log_sample_rate=0.01, otel=False):
+        self.log_sample_rate = log_sample_rate
+        self.tracer = None
+        if otel:
+            try:
+                from opentelemetry import trace
+
+                self.tracer = trace.get_tracer("leetcode-ai-enhancer")
+            except ImportError:
+                logger.warning("TELEMETRY_OTEL is set but opentelemetry-api is not installed")
+        self._gauges = []
+        if prometheus_client is not None:
+            self.registry = prometheus_client.CollectorRegistry()
+            self.registry.register(_GaugeCollector(self))
+        else:
+            self.registry = []
+        self.requests = self._histogram(
+            "llm_api_request_seconds", "End-to-end API request latency", ["path", "status"])
+        self.stages = self._histogram(
+            "llm_api_stage_seconds", "Time spent in each request stage", ["endpoint", "stage"])
+        self.provider_latency = self._histogram(
+            "llm_provider_seconds", "Provider call latency", ["route", "outcome"])
+        self.provider_ttft = self._histogram(
+            "llm_provider_ttft_seconds", "Provider time to first streamed token", ["route"])
+        self.prompt_size = self._histogram(
+            "llm_prompt_tokens", "Packed prompt size in tokens", ["endpoint"], buckets=TOKEN_BUCKETS)
+        self.tokens = self._counter("llm_tokens", "Tokens reported by providers", ["route", "kind"])
+        self.tier_latency = self._histogram(
+            "llm_tier_seconds", "Model call latency by tier, including failover", ["tier", "outcome"])
+        self.tier_cost = self._counter("llm_tier_cost_usd", "Estimated provider cost by tier", ["tier"])
+        self.parse_outcomes = self._counter(
+            "llm_output_parse", "Structured output parse outcomes (clean, repaired, reasked, failed)", ["chain", "outcome"])
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            log_sample_rate=float(os.getenv("LOG_BODY_SAMPLE_RATE", "0.01")),
+            otel=os.getenv("TELEMETRY_OTEL", "0") == "1",
+        )
+
+    def _histogram(self, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        if prometheus_client is not None:
+            return prometheus_client.Histogram(name, documentation, labelnames, buckets=buckets, registry=self.registry)
+        metric = _Metric("histogram", name, documentation, labelnames, buckets)
+        self.registry.append(metric)
+        return metric
+
+    def _counter(self, name, documentation, labelnames):
+        if prometheus_client is not None:
+            return prometheus_client.Counter(name, documentation, labelnames, registry=self.registry)
+        metric = _Metric("counter", name, documentation, labelnames)
+        self.registry.append(metric)
+        return metric
+
+    def add_gauges(self, fn):
+        """Register ``fn() -> [(name, labels dict, value)]``, read at scrape time."""
+        self._gauges.append(fn)
+
+    def gauge_samples(self):
+        samples = []
+        for fn in self._gauges:
+            try:
+                samples.extend(fn())
+            except Exception as e:
+                logger.warning("Gauge callback failed: %s", e)
+        return samples
+
+    @contextmanager
+    def stage(self, endpoint, name, **attributes):
+        span = self.tracer.start_as_current_span(f"{endpoint}.{name}", attributes=attributes) if self.tracer else nullcontext()
+        start = time.perf_counter()
+        with span:
+            try:
+                yield
+            finally:
+                self.stages.labels(endpoint, name).observe(time.perf_counter() - start)
+
+    def observe_provider(self, route, seconds, ok=True, ttft=None, usage=None):
+        self.provider_latency.labels(route, "ok" if ok else "error").observe(seconds)
+        if ttft is not None:
+            self.provider_ttft.labels(route).observe(ttft)
+        for kind in ("input_tokens", "output_tokens"):
+            if usage and usage.get(kind):
+                self.tokens.labels(route, kind.split("_")[0]).inc(usage[kind])
+
+    def sampled(self):
+        return self.log_sample_rate > 0 and random.random() < self.log_sample_rate
+
+    def log_body(self, label, body, limit=2000):
+        if self.sampled():
+            text = str(body)
+            logger.info("%s: %s", label, text if len(text) <= limit else text[:limit] + "...")
+
+    def render(self):
+        """(body, content type) for the ``/metrics`` endpoint."""
+        if prometheus_client is not None:
+            registry = self.registry
+            if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+                # several workers: aggregate histograms and counters from every process;
+                # the gauges are this worker's view
+                from prometheus_client import multiprocess
+
+                registry = prometheus_client.CollectorRegistry()
+                multiprocess.MultiProcessCollector(registry)
+                registry.register(_GaugeCollector(self))
+            return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+        lines = []
+        for metric in self.registry:
+            lines.extend(metric.render())
+        by_name = {}
+        for name, labels, value in self.gauge_samples():
+            by_name.setdefault(name, []).append(f"{name}{_labels(sorted(labels.items()))} {value}")
+        for name, samples in by_name.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(samples)
+        return ("\n".join(lines) + "\n").encode(), "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _GaugeCollector:
+    """prometheus_client collector for the callbacks registered with ``add_gauges``."""
+
+    def __init__(self, telemetry):
+        self.telemetry = telemetry
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        families = {}
+        for name, labels, value in self.telemetry.gauge_samples():
+            names = sorted(labels)
+            family = families.get(name)
+            if family is None:
+                family = families[name] = GaugeMetricFamily(name, name.replace("_", " "), labels=names)
+            family.add_metric([str(labels[k]) for k in names], value)
+        return list(families.values())
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware timing each request until its last body chunk is sent,
+    so streamed responses are measured end to end."""
+
+    def __init__(self, app, telemetry=None):
+        self.app = app
+        self.telemetry = telemetry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_and_record(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        finally:
+            # label by path only for matched routes to keep cardinality bounded
+            path = scope["path"] if scope.get("endpoint") is not None else "unmatched"
+            (self.telemetry or telemetry).requests.labels(path, status).observe(time.perf_counter() - start)
+
+
+def usage_of(message):
+    """Token usage reported on a chat model result or final stream chunk, if any."""
+    return getattr(message, "usage_metadata", None) or None
+
+
+telemetry = Telemetry.from_env()
@@ -0,0 +1,297 @@
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from langchain_core.runnables import Runnable
+
+from app.services.context_packing import count_tokens
+from app.services.env import parse_mapping
+from app.services.prompts import prompts
+from app.services.provider_router import ProviderRouter
+from app.services.telemetry import telemetry, usage_of
+
+
+def with_max_tokens(route, max_tokens, thinking_budget=0):
+    provider, model, params = route
+    if provider == "groq":
+        return provider, model, dict(params, max_tokens=max_tokens)
+    if not model.startswith("gemini-2.5"):
+        return provider, model, dict(params, max_output_tokens=max_tokens)
+    # 2.5 models spend their thinking out of max_output_tokens, so the cap is raised by the budget
+    return provider, model, dict(params, max_output_tokens=max_tokens + thinking_budget, thinking_budget=thinking_budget)
+
+
+# USD per million (input, output) tokens, for the per-tier cost estimate
+DEFAULT_PRICES = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-2.5-flash": (0.30, 2.50),
+}
+
+# name: (family, "provider:model" failover order or None for the family's, output-token cap)
+DEFAULT_TIERS = {
+    "precheck": ("explain", ["groq:llama-3.1-8b-instant", "google:gemini-1.5-flash"], 5),
+    "chat_small": ("explain", ["groq:llama-3.1-8b-instant", "google:gemini-1.5-flash"], 250),
+    "chat": ("explain", None, 500),
+    "code": ("explain", None, 600),
+    "code_deep": ("explain", ["google:gemini-2.5-flash", "groq:llama-3.1-8b-instant", "google:gemini-1.5-flash"], 1200),
+    "hint": ("hint", None, 1600),
+    "hint_hard": ("hint", ["google:gemini-2.5-flash", "google:gemini-1.5-flash", "groq:llama-3.1-8b-instant"], 2012),
+    "hint_level": ("hint", None, 600),
+}
+
+# share of a tier's cap each hint level needs, and scaling by problem difficulty
+LEVEL_SHARE = {1: 0.5, 2: 0.5, 3: 0.75, 4: 1.0}
+DIFFICULTY_SCALE = {"easy": 0.75, "medium": 1.0, "hard": 1.25}
+
+
+def _price(text):
+    price_in, price_out = text.split("/")
+    return float(price_in), float(price_out)
+
+
+def _cost(usage, price):
+    usage = usage or {}
+    return ((usage.get("input_tokens") or 0) * price[0] + (usage.get("output_tokens") or 0) * price[1]) / 1e6
+
+
+class TierStats:
+    """Calls, latency window, tokens and estimated cost of one tier."""
+
+    def __init__(self, window=200):
+        self.requests = 0
+        self.failures = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, usage=None, cost=0.0, ok=True):
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.failures += 1
+                return
+            self.latencies.append(seconds)
+            usage = usage or {}
+            self.input_tokens += usage.get("input_tokens") or 0
+            self.output_tokens += usage.get("output_tokens") or 0
+            self.cost += cost
+
+    def snapshot(self):
+        with self._lock:
+            ordered = sorted(self.latencies)
+
+            def percentile(q):
+                return round(ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)], 3) if ordered else None
+
+            return {
+                "requests": self.requests,
+                "failures": self.failures,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "cost_usd": round(self.cost, 6),
+            }
+
+
+class TierRouter(Runnable):
+    """A tier's ProviderRouter that records the tier's latency, tokens and cost."""
+
+    def __init__(self, tier, router, stats, prices):
+        self.tier = tier
+        self.router = router
+        self.stats = stats
+        self.prices = prices
+
+    def _price(self, result):
+        # the serving model, as reported by the provider, else the tier's primary
+        served = (getattr(result, "response_metadata", None) or {}).get("model_name") or self.router.routes[0][1]
+        for model, price in self.prices.items():
+            if model in served:
+                return price
+        return (0.0, 0.0)
+
+    def _record(self, start, result=None, usage=None, ok=True):
+        seconds = time.perf_counter() - start
+        cost = _cost(usage, self._price(result)) if ok else 0.0
+        self.stats.record(seconds, usage, cost, ok)
+        telemetry.tier_latency.labels(self.tier, "ok" if ok else "error").observe(seconds)
+        if cost:
+            telemetry.tier_cost.labels(self.tier).inc(cost)
+
+    def invoke(self, input, config=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = self.router.invoke(input, config, **kwargs)
+        except Exception:
+            self._record(start, ok=False)
+            raise
+        self._record(start, result, usage_of(result))
+        return result
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = await self.router.ainvoke(input, config, **kwargs)
+        except Exception:
+            self._record(start, ok=False)
+            raise
+        self._record(start, result, usage_of(result))
+        return result
+
+    async def astream(self, input, config=None, **kwargs):
+        start = time.perf_counter()
+        usage, last = {}, None
+        try:
+            async for chunk in self.router.astream(input, config, **kwargs):
+                for kind, count in (usage_of(chunk) or {}).items():
+                    if isinstance(count, int):
+                        usage[kind] = usage.get(kind, 0) + count
+                if getattr(chunk, "response_metadata", None):
+                    last = chunk
+                yield chunk
+        except Exception:
+            self._record(start, ok=False)
+            raise
+        self._record(start, last, usage)
+
+
+class TieringPolicy:
+    """Picks a model tier (failover order and output-token cap) for each call.
+
+    Explain turns are tiered on the precheck decision, question length,
+    history length and code size; full hints on problem difficulty; single
+    hint levels get a cap sized to the levels asked for. ``families`` maps
+    "explain"/"hint" to the base ProviderRouter whose routes, breakers and
+    limiters the tier routers share. Caps are rounded up to ``cap_step`` so
+    only a handful of model instances are ever built. Gemini 2.5 routes get
+    ``thinking_budget`` thinking tokens (0 turns thinking off) on top of
+    their cap. With ``enabled`` off every call uses its family's base
+    router, as before tiering.
+    """
+
+    def __init__(self, families, tiers=None, prices=None, enabled=True, small_words=12, small_history=4,
+                 deep_history=10, deep_code_tokens=1500, cap_step=100, thinking_budget=0):
+        self.families = families
+        self.tiers = dict(DEFAULT_TIERS, **(tiers or {}))
+        self.prices = dict(DEFAULT_PRICES, **(prices or {}))
+        self.enabled = enabled
+        self.small_words = small_words
+        self.small_history = small_history
+        self.deep_history = deep_history
+        self.deep_code_tokens = deep_code_tokens
+        self.cap_step = cap_step
+        self.thinking_budget = thinking_budget
+        self.stats = {}
+        self._routers = {}
+        self._chains = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, families):
+        tiers = {
+            name: (spec.get("family", DEFAULT_TIERS.get(name, ("explain",))[0]), spec.get("models"), spec["max_tokens"])
+            for name, spec in json.loads(os.getenv("TIERS", "{}")).items()
+        }
+        tiers.setdefault("hint_level", ("hint", None, int(os.getenv("HINT_LEVEL_MAX_TOKENS", "600"))))
+        return cls(
+            families,
+            tiers=tiers,
+            prices=parse_mapping(os.getenv("TIER_PRICES", ""), _price),
+            enabled=os.getenv("TIERING", "1") == "1",
+            small_words=int(os.getenv("TIER_SMALL_WORDS", "12")),
+            small_history=int(os.getenv("TIER_SMALL_HISTORY", "4")),
+            deep_history=int(os.getenv("TIER_DEEP_HISTORY", "10")),
+            deep_code_tokens=int(os.getenv("TIER_DEEP_CODE_TOKENS", "1500")),
+            thinking_budget=int(os.getenv("TIER_THINKING_BUDGET", "0")),
+        )
+
+    def _round(self, tokens):
+        return int(math.ceil(tokens / self.cap_step) * self.cap_step)
+
+    def precheck_tier(self):
+        return ("precheck", None) if self.enabled else ("explain", None)
+
+    def explain_tier(self, inputs, needs_code):
+        if not self.enabled:
+            return "explain", None
+        history = len(inputs.get("chat_history") or [])
+        if needs_code:
+            deep = history >= self.deep_history or count_tokens(inputs.get("code", "")) >= self.deep_code_tokens
+            return ("code_deep" if deep else "code"), None
+        small = len(inputs["question"].split()) <= self.small_words and history <= self.small_history
+        return ("chat_small" if small else "chat"), None
+
+    def hint_tier(self, difficulty):
+        if not self.enabled:
+            return "hint", None
+        if str(difficulty).lower() == "hard":
+            return "hint_hard", None
+        scale = DIFFICULTY_SCALE.get(str(difficulty).lower(), 1.0)
+        return "hint", self._round(self.tiers["hint"][2] * scale)
+
+    def level_tier(self, levels, difficulty):
+        cap = self.tiers["hint_level"][2]
+        if not self.enabled:
+            return "hint_level", cap
+        scale = DIFFICULTY_SCALE.get(str(difficulty).lower(), 1.0)
+        needed = sum(LEVEL_SHARE.get(level, 1.0) for level in levels) * cap * scale
+        return "hint_level", min(self._round(needed), self.tiers["hint"][2])
+
+    def router(self, tier, max_tokens=None):
+        key = (tier, max_tokens)
+        if key in self._routers:
+            return self._routers[key]
+        with self._lock:
+            if key not in self._routers:
+                self._routers[key] = self._build(tier, max_tokens)
+        return self._routers[key]
+
+    def _build(self, tier, max_tokens):
+        if not self.enabled and tier in self.families:
+            # the family's base router, untouched
+            base, routes = self.families[tier], None
+        else:
+            family, models, cap = self.tiers[tier]
+            base = self.families[family]
+            by_name = {ProviderRouter.route_name(route): route for route in base.routes}
+            routes = [by_name[name] for name in models if name in by_name] if models else list(base.routes)
+            routes = [with_max_tokens(route, max_tokens or cap, self.thinking_budget) for route in routes]
+        router = base
+        if routes is not None:
+            router = ProviderRouter(base.registry, routes, base.board, hedge=base.hedge,
+                                    hedge_min_delay=base.hedge_min_delay, hedge_default_delay=base.hedge_default_delay,
+                                    admission=base.admission)
+            # per-provider RPM limiters are shared with the base router
+            router.limiters = base.limiters
+        stats = self.stats.setdefault(tier, TierStats())
+        return TierRouter(tier, router, stats, self.prices)
+
+    def models(self, tier, max_tokens=None):
+        """The tier's failover order as "provider:model" names, e.g. for cache keys."""
+        return ",".join(ProviderRouter.route_name(route) for route in self.router(tier, max_tokens).router.routes)
+
+    def chain(self, prompt_name, tier, max_tokens=None):
+        """``prompts.get(prompt_name) | router(tier, max_tokens)``, built once per combination."""
+        key = (prompt_name, tier, max_tokens)
+        if key not in self._chains:
+            self._chains[key] = prompts.get(prompt_name) | self.router(tier, max_tokens)
+        return self._chains[key]
+
+    def routes(self):
+        """Every tier's routes at its default cap and the full-hint caps per difficulty, for warming."""
+        keys = [(tier, None) for tier in self.tiers] + [self.hint_tier(level) for level in DIFFICULTY_SCALE]
+        return [route for key in dict.fromkeys(keys) for route in self.router(*key).router.routes]
+
+    def snapshot(self):
+        routers = list(self._routers.values())
+        snapshot = {tier: stats.snapshot() for tier, stats in self.stats.items()}
+        for tier_router in routers:
+            snapshot[tier_router.tier]["hedges"] = snapshot[tier_router.tier].get("hedges", 0) + tier_router.router.hedges
+        return snapshot
@@ -0,0 +1,107 @@
+"""Pre-generate hints for a problem catalogue into the hint cache.
+
+Usage (from ``backend/``)::
+
+    python -m app.warm_hints problems.jsonl --concurrency 4 --rpm google:gemini-1.5-flash=60
+
+Each line of the catalogue is a ``ProblemData`` object (title, difficulty,
+description, id). Hints are generated with the same prompt, parser and cache
+key as ``/api/hint`` and written to ``HINT_CACHE_URL``, so the API serves
+them without an LLM call. Finished ids are appended to the checkpoint file
+and skipped on the next run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+
+from app.main import ProblemData, compute_hints, hint_cache, hint_cache_key, hint_model
+from app.services.rate_limit import TokenBucket
+
+
+def load_catalogue(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield ProblemData(**json.loads(line))
+
+
+def load_checkpoint(path):
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+def parse_rpm(values):
+    """``provider:model=requests_per_minute`` -> {route name: TokenBucket}"""
+    limiters = {}
+    for value in values:
+        name, rpm = value.rsplit("=", 1)
+        limiters[name] = TokenBucket(rate=float(rpm) / 60.0, capacity=1)
+    return limiters
+
+
+async def warm(problems, concurrency, checkpoint_path):
+    done = load_checkpoint(checkpoint_path)
+    queue = asyncio.Queue()
+    for problem in problems:
+        if problem.id not in done:
+            queue.put_nowait(problem)
+    total = queue.qsize()
+    stats = {"generated": 0, "cached": 0, "failed": 0}
+    checkpoint = open(checkpoint_path, "a") if checkpoint_path else None
+    start = time.perf_counter()
+
+    async def worker():
+        while True:
+            try:
+                problem = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            cache_key = hint_cache_key(problem)
+            try:
+                if await hint_cache.get(cache_key) is not None:
+                    stats["cached"] += 1
+                else:
+                    await compute_hints(problem, cache_key)
+                    stats["generated"] += 1
+                if checkpoint:
+                    checkpoint.write(problem.id + "\n")
+                    checkpoint.flush()
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"Failed {problem.id} ({problem.title}):", e)
+            finished = sum(stats.values())
+            if finished % 10 == 0 or finished == total:
+                print(f"[{finished}/{total}] {stats} {time.perf_counter() - start:.1f}s", flush=True)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        if checkpoint:
+            checkpoint.close()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-generate hints for a JSONL problem catalogue.")
+    parser.add_argument("catalogue", help="JSONL file with one ProblemData object per line")
+    parser.add_argument("--concurrency", type=int, default=4, help="parallel generations (default 4)")
+    parser.add_argument("--rpm", action="append", default=[], metavar="PROVIDER:MODEL=N",
+                        help="requests per minute for a provider model, e.g. google:gemini-1.5-flash=60")
+    parser.add_argument("--checkpoint", default="warm_hints.checkpoint",
+                        help="file of finished problem ids, used to resume (default warm_hints.checkpoint)")
+    args = parser.parse_args()
+
+    if not hint_cache.durable:
+        print("Warning: HINT_CACHE_URL has no durable backend, warmed hints will be lost on exit.")
+    hint_model.limiters.update(parse_rpm(args.rpm))
+    stats = asyncio.run(warm(load_catalogue(args.catalogue), args.concurrency, args.checkpoint))
+    print("Done:", stats)
+
+
+if __name__ == "__main__":
+    main()
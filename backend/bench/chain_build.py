@@ -0,0 +1,76 @@
+"""Micro-benchmark: per-request chain construction vs. chains built once.
+
+    python -m bench.chain_build --iterations 2000
+
+"per-request" rebuilds what the handlers used to build on every call (three
+explain prompts, the branch, the hint prompt and its Pydantic parser with
+format instructions); "prebuilt" only assembles the inputs dict and formats
+the prebuilt prompt, which both variants also have to do.
+"""
+import argparse
+import time
+import tracemalloc
+
+from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableBranch, RunnableLambda
+
+from app.main import MultiLevelHint, explain_inputs, explain_model, hint_model
+from app.services.prompts import prompts
+from bench.fixtures import CODE, DESCRIPTION
+
+
+def per_request():
+    with_code = ChatPromptTemplate(prompts.get("explain_with_code").messages)
+    without_code = ChatPromptTemplate(prompts.get("explain_without_code").messages)
+    precheck = ChatPromptTemplate(prompts.get("precheck").messages)
+
+    def check(inputs):
+        return (precheck | explain_model) is not None
+
+    RunnableBranch((check, RunnableLambda(lambda x: with_code.invoke(x)) | explain_model),
+                   RunnableLambda(lambda x: without_code.invoke(x)) | explain_model)
+    hint = ChatPromptTemplate(prompts.get("hint").messages)
+    parser = PydanticOutputParser(pydantic_object=MultiLevelHint)
+    parser.get_format_instructions()
+    hint | hint_model | parser
+    return with_code
+
+
+def prebuilt():
+    return prompts.get("explain_with_code")
+
+
+def measure(build, iterations):
+    inputs = explain_inputs(DESCRIPTION, CODE, [], "why does my code fail?", "bench")
+    for _ in range(50):
+        build().format_messages(**inputs)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        build().format_messages(**inputs)
+    per_call = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    build().format_messages(**inputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    for _ in range(100):
+        build().format_messages(**inputs)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0) / 100
+    return per_call, peak, allocated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    for name, build in [("per-request", per_request), ("prebuilt", prebuilt)]:
+        per_call, peak, allocated = measure(build, args.iterations)
+        print(f"{name:12s} {per_call * 1e6:9.1f} us/request  peak {peak / 1024:7.1f} KiB  retained {allocated / 1024:6.2f} KiB/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeChatModel(BaseChatModel):
+    """Deterministic chat model with configurable latency and token rate.
+
+    The first token arrives after ``latency`` seconds and the rest of
+    ``text`` (split on spaces) at ``tokens_per_second``. ``responder`` may
+    compute the text from the prompt messages instead.
+    """
+
+    text: str = "This is a fake answer."
+    latency: float = 0.2
+    tokens_per_second: float = 200.0
+    responder: object = None
+
+    @property
+    def _llm_type(self):
+        return "fake-bench"
+
+    def _answer(self, messages):
+        return self.responder(messages) if self.responder else self.text
+
+    @staticmethod
+    def _tokens(answer):
+        words = answer.split(" ")
+        return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+    def _duration(self, answer):
+        return self.latency + max(0, len(self._tokens(answer)) - 1) / self.tokens_per_second
+
+    @staticmethod
+    def _result(answer):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    # the answer is computed once per call, so ``responder`` sees each prompt once
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        answer = self._answer(messages)
+        time.sleep(self._duration(answer))
+        return self._result(answer)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        answer = self._answer(messages)
+        await asyncio.sleep(self._duration(answer))
+        return self._result(answer)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        answer = self._answer(messages)
+        await asyncio.sleep(self.latency)
+        for i, token in enumerate(self._tokens(answer)):
+            if i:
+                await asyncio.sleep(1.0 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+HINT_JSON = (
+    '{"problem_title": "Benchmark Problem", "hints": {'
+    '"1": "Think about what you need to remember while scanning the input once.", '
+    '"2": "A hash map from value to index lets you look up complements in O(1).", '
+    '"3": "Iterate, compute the complement, check the map, then store the current value.", '
+    '"4": "Watch out for using the same element twice; this runs in O(n) time and space."}}'
+)
+EXPLAIN_TEXT = " ".join(["Here is a detailed explanation of the approach and its complexity."] * 12)
+
+
+def default_responder(messages):
+    """Answer the app's three prompt shapes: precheck, hint JSON and chat."""
+    system = str(messages[0].content) if messages else ""
+    if "binary classifier" in system:
+        return "1"
+    if "JSON object" in system:
+        return HINT_JSON
+    return EXPLAIN_TEXT
@@ -0,0 +1,55 @@
+import itertools
+
+DESCRIPTION = (
+    "Given an array of integers nums and an integer target, return indices of the two numbers "
+    "such that they add up to target. You may assume that each input would have exactly one "
+    "solution, and you may not use the same element twice. " * 4
+)
+CODE = "\n".join(
+    [
+        "class Solution:",
+        "    def twoSum(self, nums, target):",
+        "        seen = {}",
+        "        for i, n in enumerate(nums):",
+        "            if target - n in seen:",
+        "                return [seen[target - n], i]",
+        "            seen[n] = i",
+    ]
+)
+QUESTIONS = [
+    "why does my code fail on the second example?",
+    "what is the time complexity of a hash map lookup?",
+    "hi!",
+    "can you review my solution?",
+]
+
+_ids = itertools.count()
+
+
+def hint_request(unique=True):
+    problem_id = f"bench-{next(_ids)}" if unique else "bench-hot"
+    return {
+        "problem_data": {"title": "Two Sum", "difficulty": "Easy", "description": DESCRIPTION, "id": problem_id},
+        "hint_level": 1,
+    }
+
+
+def explain_request(chat_turns, with_code=True):
+    n = next(_ids)
+    chat = [{"sender": "ai", "text": "Hi! I'm here to help you. What would you like to discuss about this problem?"}]
+    for i in range(chat_turns):
+        chat.append({"sender": "user", "text": QUESTIONS[i % len(QUESTIONS)]})
+        chat.append({"sender": "ai", "text": "Here is a detailed explanation of the approach and its complexity. " * 3})
+    chat.append({"sender": "user", "text": QUESTIONS[n % len(QUESTIONS)]})
+    return {"chat": chat, "problem": f"problem title:Two Sum problem description:{DESCRIPTION}", "code": CODE if with_code else ""}
+
+
+# scenario name -> (path, payload factory)
+SCENARIOS = {
+    "hint": ("/api/hint", lambda: hint_request(unique=True)),
+    "hint-hot": ("/api/hint", lambda: hint_request(unique=False)),
+    "explain-short": ("/api/explain", lambda: explain_request(1)),
+    "explain-medium": ("/api/explain", lambda: explain_request(20)),
+    "explain-long": ("/api/explain", lambda: explain_request(100)),
+    "explain-nocode": ("/api/explain", lambda: explain_request(5, with_code=False)),
+}
@@ -0,0 +1,176 @@
+"""Load driver for the API.
+
+In-process (default) the app runs on the driver's event loop with every
+chat model replaced by ``FakeChatModel``; with ``--url`` it drives a real
+server, e.g. one started with ``uvicorn bench.serve_fake:app --workers 4``.
+
+    python -m bench.load --scenario explain-medium --requests 500 --concurrency 50
+"""
+import argparse
+import asyncio
+import math
+import os
+import resource
+import time
+
+import httpx
+
+from bench.fixtures import SCENARIOS
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, math.ceil(q * len(ordered)) - 1)]
+
+
+def rss_mb():
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class LagMonitor:
+    """Samples how late a short sleep wakes up, i.e. event-loop blocking."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.samples = []
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(time.perf_counter() - start - self.interval)
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def summary(self):
+        return {
+            "lag_p50_ms": percentile(self.samples, 0.5) * 1000,
+            "lag_p99_ms": percentile(self.samples, 0.99) * 1000,
+            "lag_max_ms": max(self.samples, default=0.0) * 1000,
+        }
+
+
+async def drive(client, path, make_payload, requests, concurrency):
+    latencies, errors = [], 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=make_payload())
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "throughput_rps": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def install_fake_models(latency, tokens_per_second):
+    from app import main
+    from bench.fake_llm import FakeChatModel, default_responder
+
+    fake = FakeChatModel(latency=latency, tokens_per_second=tokens_per_second, responder=default_responder)
+    main.models.get = lambda *args, **kwargs: fake
+    # every simulated user shares one address; per-client rate limits would
+    # turn the run into a 429 benchmark. Provider concurrency caps still apply.
+    main.admission.client_rate = 0
+    return main.app
+
+
+async def run_in_process(args):
+    app = install_fake_models(args.latency, args.tps)
+    path, make_payload = SCENARIOS[args.scenario]
+    monitor = LagMonitor()
+    monitor.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        report = await drive(client, path, make_payload, args.requests, args.concurrency)
+    monitor.stop()
+    report.update(monitor.summary())
+    report["workers"] = {os.getpid(): {"rss_mb": rss_mb()}}
+    return report
+
+
+async def run_remote(args):
+    path, make_payload = SCENARIOS[args.scenario]
+    async with httpx.AsyncClient(base_url=args.url, timeout=None) as client:
+        await worker_stats(client, args.stats_polls)  # starts the lag monitors
+        report = await drive(client, path, make_payload, args.requests, args.concurrency)
+        report["workers"] = await worker_stats(client, args.stats_polls)
+    return report
+
+
+async def worker_stats(client, polls):
+    """Poll /bench/stats until each worker has answered (best effort)."""
+    workers = {}
+    for _ in range(polls):
+        try:
+            # a fresh connection each time so the polls spread over workers
+            response = await client.get("/bench/stats", headers={"Connection": "close"})
+        except httpx.HTTPError:
+            break
+        if response.status_code != 200:
+            break
+        data = response.json()
+        workers[data.pop("pid")] = data
+    return workers
+
+
+def print_report(scenario, report):
+    print(f"scenario {scenario}: {report['requests']} requests, {report['errors']} errors, {report['elapsed_s']:.2f}s")
+    print(f"  throughput {report['throughput_rps']:.1f} req/s")
+    print(f"  latency    p50 {report['p50_ms']:.1f} ms  p95 {report['p95_ms']:.1f} ms  p99 {report['p99_ms']:.1f} ms")
+    if "lag_p50_ms" in report:
+        print(f"  loop lag   p50 {report['lag_p50_ms']:.2f} ms  p99 {report['lag_p99_ms']:.2f} ms  max {report['lag_max_ms']:.2f} ms")
+    for pid, stats in report["workers"].items():
+        details = "  ".join(f"{k} {v:.2f}" for k, v in stats.items())
+        print(f"  worker {pid}: {details}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API with a deterministic fake LLM.")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="explain-short")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="fake time to first token, seconds")
+    parser.add_argument("--tps", type=float, default=200.0, help="fake tokens per second")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--stats-polls", type=int, default=16, help="/bench/stats polls to reach every worker")
+    args = parser.parse_args()
+
+    run = run_remote if args.url else run_in_process
+    print_report(args.scenario, asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Calibrate the semantic cache's similarity threshold on labelled question pairs.
+
+    python -m bench.semantic_threshold
+
+SAME pairs are paraphrases that should share a cached answer; DIFFERENT
+pairs ask something else (often one word or the word order apart) and must
+not. Prints every pair's score and the threshold halfway between the
+lowest SAME and the highest DIFFERENT score.
+"""
+from app.services.semantic_cache import embed
+
+SAME = [
+    ("what is the time complexity?", "whats the time complexity"),
+    ("What is the time complexity of this approach?", "what's the time complexity of this approach"),
+    ("How does a hash map work?", "how do hash maps work"),
+    ("Can you explain the two pointer technique?", "explain the two pointers technique please"),
+    ("Explain the problem constraints", "can you explain the constraints of the problem"),
+    ("What data structure should I use?", "which data structure should i use"),
+    ("Give me a hint for this problem", "can you give me a hint for the problem"),
+    ("How do I handle duplicate values?", "how should I handle duplicate values"),
+    ("What are the edge cases?", "what edge cases are there"),
+    ("What is the intuition behind the solution?", "whats the intuition behind this solution"),
+    ("Explain the difference between BFS and DFS", "what is the difference between BFS and DFS"),
+    ("Why does the greedy approach fail here?", "why would a greedy approach fail here"),
+    ("What is the optimal approach?", "what's the most optimal approach"),
+    ("What is the time complexity of a hash map lookup?", "time complexity of hash map lookups"),
+]
+DIFFERENT = [
+    ("why is BFS better than DFS here", "why is DFS better than BFS here"),
+    ("What is the time complexity?", "What is the space complexity?"),
+    ("How does a hash map work?", "How does a heap work?"),
+    ("Explain the two pointer technique", "Explain the sliding window technique"),
+    ("What is the best case complexity?", "What is the worst case complexity?"),
+    ("Is recursion faster than iteration here?", "Is iteration faster than recursion here?"),
+    ("How do I handle negative numbers?", "How do I handle duplicate numbers?"),
+    ("What is dynamic programming?", "What is a greedy algorithm?"),
+    ("Why use a stack instead of a queue?", "Why use a queue instead of a stack?"),
+    ("Give me a hint for this problem", "Give me the full solution for this problem"),
+    ("What are the edge cases?", "What are the constraints?"),
+    ("How do I sort the array?", "How do I reverse the array?"),
+]
+
+
+def similarity(a, b):
+    return float(embed(a) @ embed(b))
+
+
+def calibrate():
+    """(lowest SAME score, highest DIFFERENT score, threshold halfway between)."""
+    low = min(similarity(a, b) for a, b in SAME)
+    high = max(similarity(a, b) for a, b in DIFFERENT)
+    return low, high, round((low + high) / 2, 2)
+
+
+def main():
+    for label, pairs in (("same", SAME), ("different", DIFFERENT)):
+        for a, b in pairs:
+            print(f"{label:9s} {similarity(a, b):.3f}  {a!r} / {b!r}")
+    low, high, threshold = calibrate()
+    print(f"lowest same {low:.3f}, highest different {high:.3f}, threshold {threshold}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Micro-benchmark: request validation and response encoding for long chats.
+
+    python -m bench.serialization --messages 200 --iterations 500
+
+"before" decodes the body with the stdlib, validates ``chat`` as
+``list[object]``, reads messages by key and encodes responses and SSE
+frames with the stdlib encoder; "after" decodes with ``loads`` (as
+``FastJSONRoute`` does), validates the typed ``ChatMessage`` model and
+encodes with ``FastJSONResponse`` and the compact ``dumps``. Both build
+the LangChain history messages, which dominates for long chats.
+"""
+import argparse
+import json
+import time
+from typing import Optional
+
+from fastapi.responses import JSONResponse
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+
+from app.main import ExplainResponse, explainRequest
+from app.services.serialization import FastJSONResponse, dumps, loads
+from bench.fixtures import CODE
+
+
+class LegacyExplainRequest(BaseModel):
+    chat: Optional[list[object]] = None
+    problem: Optional[str] = None
+    code: Optional[str] = None
+
+
+def payload(messages):
+    chat = [{"id": i, "sender": "user" if i % 2 else "ai", "text": f"Message {i}: " + "why is this O(n^2)? " * 20,
+             "timestamp": "2024-01-01T00:00:00.000Z"} for i in range(messages)]
+    return json.dumps({"chat": chat, "problem": "Two Sum", "code": CODE}).encode()
+
+
+def before(raw, answer, tokens):
+    request = LegacyExplainRequest(**json.loads(raw))
+    history = []
+    for msg in request.chat:
+        if msg["sender"] == "ai":
+            history.append(AIMessage(content=msg["text"]))
+        elif msg["sender"] == "user":
+            history.append(HumanMessage(content=msg["text"]))
+    JSONResponse(ExplainResponse(explanation=answer).model_dump())
+    for token in tokens:
+        f"event: token\ndata: {json.dumps({'text': token})}\n\n"
+    return history
+
+
+def after(raw, answer, tokens):
+    request = explainRequest(**loads(raw))
+    history = []
+    for msg in request.chat:
+        if msg.sender == "ai":
+            history.append(AIMessage(content=msg.text))
+        elif msg.sender == "user":
+            history.append(HumanMessage(content=msg.text))
+    FastJSONResponse(ExplainResponse(explanation=answer).model_dump())
+    for token in tokens:
+        f"event: token\ndata: {dumps({'text': token})}\n\n"
+    return history
+
+
+def measure(fn, raw, answer, tokens, iterations):
+    for _ in range(20):
+        fn(raw, answer, tokens)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(raw, answer, tokens)
+    return (time.perf_counter() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+    raw = payload(args.messages)
+    answer = "Use a hash map from value to index. " * 60
+    tokens = answer.split(" ")
+    print(f"{args.messages} messages, {len(raw) / 1024:.0f} KiB request, {len(tokens)} SSE frames")
+    for name, fn in [("before", before), ("after", after)]:
+        per_call = measure(fn, raw, answer, tokens, args.iterations)
+        print(f"{name:7s} {per_call * 1e3:8.3f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
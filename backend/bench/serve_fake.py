@@ -0,0 +1,18 @@
+"""The API with every chat model replaced by FakeChatModel, for load tests.
+
+    BENCH_LATENCY=0.2 BENCH_TPS=200 uvicorn bench.serve_fake:app --workers 4
+
+Adds ``GET /bench/stats`` reporting this worker's pid, RSS and event-loop lag.
+"""
+import os
+
+from bench.load import LagMonitor, install_fake_models, rss_mb
+
+app = install_fake_models(float(os.getenv("BENCH_LATENCY", "0.2")), float(os.getenv("BENCH_TPS", "200")))
+monitor = LagMonitor()
+
+
+@app.get("/bench/stats")
+async def bench_stats():
+    monitor.start()
+    return {"pid": os.getpid(), "rss_mb": rss_mb(), **monitor.summary()}
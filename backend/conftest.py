@@ -0,0 +1,31 @@
+import httpx
+import pytest
+
+from app import main
+from app.services.hint_cache import HintCache
+from app.services.session_store import SessionStore
+from bench.fake_llm import FakeChatModel
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Factory for in-process clients of the app, with fresh sessions and hint cache and no per-client rate limit."""
+    monkeypatch.setattr(main.admission, "client_rate", 0)
+    monkeypatch.setattr(main, "sessions", SessionStore())
+    monkeypatch.setattr(main, "hint_cache", HintCache())
+
+    def client():
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test")
+
+    return client
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Serve every model from ``FakeChatModel(**kwargs)``, with no latency unless given."""
+
+    def use(**kwargs):
+        kwargs.setdefault("latency", 0)
+        monkeypatch.setattr(main.models, "get", lambda *a, **kw: FakeChatModel(**kwargs))
+
+    return use
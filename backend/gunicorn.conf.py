@@ -0,0 +1,50 @@
+"""Gunicorn settings for serving the API with several uvicorn workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Set ``SHARED_STATE_URL`` to Redis so sessions, rate limits and single-flight
+locks are shared between the workers, and ``PROMETHEUS_MULTIPROC_DIR`` to an
+empty directory so ``/metrics`` aggregates every worker.
+"""
+import multiprocessing
+import os
+import sys
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+# the API is I/O bound on the LLM providers; one event loop per core, but
+# only when sessions, rate limits and locks are shared through Redis:
+# in-memory state is per worker, so several workers would each see a part
+shared = os.getenv("SHARED_STATE_URL", "memory").startswith(("redis://", "rediss://"))
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() if shared else 1)))
+if workers > 1 and not shared:
+    print(f"Warning: {workers} workers with in-memory SHARED_STATE_URL; sessions, rate limits and "
+          "single-flight locks will not be shared between them", file=sys.stderr)
+# LLM calls and streams run long; only kill a worker that is truly stuck
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+# on SIGTERM/reload, stop accepting and let in-flight requests finish
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+# recycle workers now and then to bound memory growth (0 disables)
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+# no preload: provider clients, Redis connections and the log thread must be
+# created per worker (they do not survive a fork); each worker warms its
+# model clients in the background after it starts serving, and reports
+# ready on /ready once that is done
+preload_app = False
+
+
+def on_starting(server):
+    multiproc_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+        for name in os.listdir(multiproc_dir):
+            os.remove(os.path.join(multiproc_dir, name))
+
+
+def child_exit(server, worker):
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
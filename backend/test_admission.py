@@ -0,0 +1,96 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.admission import (
+    BACKGROUND, HINT, INTERACTIVE, AdmissionControl, AdmissionMiddleware, Overloaded, PriorityLimiter,
+)
+
+
+def test_waiters_are_served_by_priority():
+    async def scenario():
+        limiter = PriorityLimiter(capacity=1)
+        order = []
+
+        async def work(name, priority):
+            async with limiter.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await limiter.acquire()
+        tasks = [asyncio.create_task(work(name, p)) for name, p in
+                 [("prefetch", BACKGROUND), ("hint", HINT), ("chat", INTERACTIVE)]]
+        await asyncio.sleep(0)
+        limiter.release(0.0)
+        await asyncio.gather(*tasks)
+        return order, limiter.active
+
+    order, active = asyncio.run(scenario())
+    assert order == ["chat", "hint", "prefetch"]
+    assert active == 0
+
+
+def test_full_queue_sheds_lowest_priority_first():
+    async def scenario():
+        limiter = PriorityLimiter(capacity=1, max_queue=1)
+        await limiter.acquire()
+        background = asyncio.create_task(limiter.acquire(BACKGROUND))
+        await asyncio.sleep(0)
+        chat = asyncio.create_task(limiter.acquire(INTERACTIVE))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await background
+        with pytest.raises(Overloaded) as shed:
+            await limiter.acquire(HINT)  # queue full of higher priority work
+        limiter.release(0.0)
+        await chat
+        return shed.value.retry_after, limiter.shed
+
+    retry_after, shed = asyncio.run(scenario())
+    assert retry_after >= 1
+    assert shed == 2
+
+
+def test_waiter_is_shed_after_max_wait():
+    async def scenario():
+        limiter = PriorityLimiter(capacity=1, max_wait=0.01)
+        await limiter.acquire()
+        with pytest.raises(Overloaded):
+            await limiter.acquire()
+        limiter.release(0.0)
+        return limiter.active, len(limiter._waiters)
+
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+async def ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def test_client_over_rate_gets_429():
+    app = AdmissionMiddleware(ok, AdmissionControl(client_rate=0.1, client_burst=2))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            install = [await client.post("/api/explain", headers={"X-Client-Id": "install-1"}) for _ in range(3)]
+            other = await client.post("/api/explain", headers={"X-Client-Id": "install-2"})
+            stats = await client.get("/api/stats", headers={"X-Client-Id": "install-1"})
+        return install, other, stats
+
+    install, other, stats = asyncio.run(scenario())
+    assert [r.status_code for r in install] == [200, 200, 429]
+    assert int(install[2].headers["Retry-After"]) >= 1
+    assert other.status_code == 200
+    assert stats.status_code == 200
+
+
+def test_rotating_client_ids_still_hit_the_address_limit():
+    app = AdmissionMiddleware(ok, AdmissionControl(client_rate=0.1, client_burst=2, address_rate=0.1, address_burst=3))
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return [await client.post("/api/explain", headers={"X-Client-Id": f"install-{i}"}) for i in range(4)]
+
+    assert [r.status_code for r in asyncio.run(scenario())] == [200, 200, 200, 429]
@@ -0,0 +1,45 @@
+import asyncio
+import json
+import time
+
+DELAY = 0.3
+N = 10
+
+
+async def _timed_batch(api, path, payloads):
+    async with api() as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*(client.post(path, json=p) for p in payloads))
+        return time.perf_counter() - start, responses
+
+
+def _explain_payload(i):
+    return {
+        "chat": [{"sender": "ai", "text": "Hi!"}, {"sender": "user", "text": f"question {i}"}],
+        "problem": "Two Sum",
+        "code": "",
+    }
+
+
+def _hint_payload(i):
+    return {
+        "problem_data": {"title": "Two Sum", "difficulty": "Easy", "description": "desc", "id": f"stub-{i}"},
+        "hint_level": 1,
+    }
+
+
+def test_explain_requests_run_concurrently(api, fake_models):
+    fake_models(text="0", latency=DELAY, tokens_per_second=1e6)
+    elapsed, responses = asyncio.run(_timed_batch(api, "/api/explain", [_explain_payload(i) for i in range(N)]))
+    assert all(r.status_code == 200 for r in responses)
+    # at most precheck + answer per request; N requests should overlap
+    assert elapsed < 2 * DELAY * 2
+
+
+def test_hint_requests_run_concurrently(api, fake_models):
+    text = json.dumps({"problem_title": "Two Sum", "hints": {"1": "a", "2": "b", "3": "c", "4": "d"}})
+    fake_models(text=text, latency=DELAY, tokens_per_second=1e6)
+    elapsed, responses = asyncio.run(_timed_batch(api, "/api/hint", [_hint_payload(i) for i in range(N)]))
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json()["hint"]["1"] == "a" for r in responses)
+    assert elapsed < 2 * DELAY
@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+import pytest
+
+from app import main
+from app.services.code_classifier import CodeRelevanceClassifier
+
+# question, needs the code, decided locally at the default 0.8 threshold
+CASES = [
+    ("Why does my code fail on the second example?", True, True),
+    ("I get TLE on test 57", True, True),
+    ("Is my solution correct?", True, True),
+    ("Can you review my code?", True, True),
+    ("what does line 4 do", True, True),
+    ("thanks!", False, True),
+    ("hello", False, True),
+    ("What is a hash map?", False, True),
+    ("Explain the problem constraints", False, True),
+    ("Can you give me a hint?", False, True),
+    ("why is it slow", True, False),
+    ("how does the sliding window work", False, False),
+]
+
+
+@pytest.mark.parametrize("question,needs_code,local", CASES)
+def test_rules_and_threshold(question, needs_code, local):
+    classifier = CodeRelevanceClassifier()
+    decision, confidence = classifier.classify(question)
+    assert decision == needs_code
+    assert (confidence >= classifier.threshold) == local
+
+
+def test_token_weights_from_model_file(tmp_path):
+    path = tmp_path / "model.json"
+    path.write_text(json.dumps({"bias": 0.0, "weights": {"slow": 3.0}}))
+    assert CodeRelevanceClassifier(model_path=str(path)).classify("why is it slow")[1] > 0.95
+
+
+def test_low_confidence_falls_back_to_the_precheck(fake_models, monkeypatch):
+    fake_models(text="1")
+    monkeypatch.setattr(main, "code_classifier", CodeRelevanceClassifier())
+    inputs = {"question": "how does the sliding window work", "code": "def f(): pass"}
+    assert asyncio.run(main.needs_code_check(inputs)) is True
+    assert asyncio.run(main.needs_code_check(dict(inputs, question="thanks!"))) is False
+    assert asyncio.run(main.needs_code_check(dict(inputs, code=" "))) is False
+    counts = main.code_classifier.stats.snapshot()
+    assert (counts["fallback"], counts["local_general"], counts["no_code"]) == (1, 1, 1)
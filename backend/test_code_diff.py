@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.services.code_diff import UNCHANGED, CodeDiffer, CodeOutOfSync, apply_edit, code_hash
+
+CODE = "\n".join(["def two_sum(nums, target):", "    seen = {}"] + [f"    # note {i}" for i in range(40)] + [
+    "    for i, n in enumerate(nums):",
+    "        if target - n in seen:",
+    "            return [seen[target - n], i]",
+    "        seen[n] = i",
+])
+
+
+def test_apply_edit_replaces_a_line_range():
+    assert apply_edit("a\nb\nc", 1, 2, ["B", "B2"]) == "a\nB\nB2\nc"
+    assert apply_edit("a\nb", 2, 2, ["c"]) == "a\nb\nc"
+    with pytest.raises(CodeOutOfSync):
+        apply_edit("a\nb", 1, 5, [])
+
+
+def test_view_sends_small_changes_as_a_diff():
+    differ = CodeDiffer()
+    edited = CODE.replace("seen[n] = i", "seen[n] = i  # store index")
+    assert differ.view(None, CODE) == (CODE, "full")
+    assert differ.view(CODE, CODE) == (UNCHANGED, "unchanged")
+    text, mode = differ.view(CODE, edited)
+    assert mode == "diff"
+    assert "+        seen[n] = i  # store index" in text and "# note 3" not in text
+    assert differ.view(CODE, "print('rewritten')")[1] == "full"
+
+
+def test_follow_up_turns_send_only_what_changed(api, fake_models):
+    prompts = []
+
+    def respond(messages):
+        if "binary classifier" in messages[0].content:
+            return "1"
+        prompts.append(messages[-1].content)
+        return "Looks fine."
+
+    fake_models(responder=respond)
+    edited = CODE.replace("seen[n] = i", "seen[n] = i  # store index")
+
+    async def scenario():
+        async with api() as client:
+            first = await client.post("/api/explain", json={
+                "message": "Why does my code fail?", "problem": "Two Sum", "code": CODE})
+            session_id = first.json()["session_id"]
+            turn = {"session_id": session_id, "message": "What about my code now?"}
+            edit = {"base_hash": code_hash(CODE), "start": 45, "end": 46, "lines": ["        seen[n] = i  # store index"]}
+            responses = [
+                await client.post("/api/explain", json=dict(turn, code_edit=edit, code_hash=code_hash(edited))),
+                await client.post("/api/explain", json=dict(turn, code_hash=code_hash(edited))),
+                await client.post("/api/explain", json=dict(turn, code_hash=code_hash(CODE))),
+            ]
+        return first, responses
+
+    first, (diff, unchanged, stale) = asyncio.run(scenario())
+    assert first.status_code == diff.status_code == unchanged.status_code == 200
+    assert stale.status_code == 409
+    assert "# note 3" in prompts[0]
+    assert "Changes since your previous review" in prompts[1] and "# note 3" not in prompts[1]
+    assert UNCHANGED in prompts[2]
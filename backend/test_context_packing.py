@@ -0,0 +1,46 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.services.context_packing import clean_description, count_tokens, pack_code, pack_history
+from app.services.env import parse_mapping
+
+HELPERS = "\n\n".join(
+    f"def helper_{i}(values):\n" + "\n".join(f"    total_{j} = sum(values) * {j}" for j in range(8)) + "\n    return total_0"
+    for i in range(12)
+)
+CODE = "class Solution:\n    def twoSum(self, nums, target):\n        return find_pair(nums, target)\n\n" + HELPERS + (
+    "\n\ndef find_pair(nums, target):\n    seen = {}\n    for i, n in enumerate(nums):\n"
+    "        if target - n in seen:\n            return [seen[target - n], i]\n        seen[n] = i\n"
+)
+
+
+def test_clean_description_strips_html_and_boilerplate():
+    raw = ("Can you solve this real interview question? Two Sum - <p>Given an array &amp; a target.</p>\n"
+           "<ul><li>Example 1</li></ul>\nAccepted 12M\nSeen this question in a real interview before? 1/5 Yes No")
+    assert clean_description(raw) == "Given an array & a target.\nExample 1"
+
+
+def test_pack_code_keeps_signature_and_relevant_blocks():
+    packed = pack_code(CODE, "why does find_pair miss the answer?", 200)
+    assert count_tokens(packed) <= 220
+    assert packed.startswith("class Solution:")
+    assert "seen[n] = i" in packed
+    assert "lines omitted" in packed and "helper_11" not in packed
+    assert pack_code("x = 1", "anything", 200) == "x = 1"
+
+
+def test_pack_history_keeps_recent_turns_and_summarises_the_rest():
+    messages = [SystemMessage(content="Summary of the earlier conversation:\nUser: hi")]
+    for i in range(10):
+        messages += [HumanMessage(content=f"Question {i}. " + "detail " * 30),
+                     AIMessage(content=f"Answer {i}. " + "detail " * 30)]
+    packed = pack_history(messages, 300)
+    assert packed[0] is messages[0]
+    assert packed[1].type == "system" and "User: Question 0." in packed[1].content
+    assert packed[-1].content.startswith("Answer 9.")
+    assert sum(count_tokens(str(m.content)) for m in packed) <= 330
+    assert pack_history(messages[:3], 10_000) == messages[:3]
+
+
+def test_parse_mapping():
+    assert parse_mapping(" groq=8, google=16 ,") == {"groq": 8, "google": 16}
+    assert parse_mapping("m=0.1/0.2", lambda v: tuple(map(float, v.split("/")))) == {"m": (0.1, 0.2)}
@@ -0,0 +1,46 @@
+import asyncio
+import json
+import re
+
+from app import main
+
+HINTS = {"1": "a", "2": "b", "3": "c", "4": "d"}
+
+
+def _problem(i):
+    return {"title": f"Problem {i}", "difficulty": "Easy", "description": f"desc {i}", "id": f"batch-{i}"}
+
+
+def test_batch_streams_hits_then_grouped_misses(monkeypatch, api, fake_models):
+    calls = []
+
+    def respond(messages):
+        prompt = messages[-1].content
+        if "several problems" in messages[0].content:
+            # leave the last problem of each group out of the combined answer
+            ids = re.findall(r"Problem id: (\S+)", prompt)[:-1]
+            calls.append(("group", ids))
+            return json.dumps({"results": [{"id": i, "hints": HINTS} for i in ids]})
+        calls.append(("single", prompt))
+        return json.dumps({"problem_title": "x", "hints": HINTS})
+
+    fake_models(responder=respond)
+    monkeypatch.setattr(main, "HINT_BATCH_GROUP", 4)
+
+    async def scenario():
+        cached = main.ProblemData(**_problem(0))
+        await main.hint_cache.set(main.hint_cache_key(cached), {"problem_title": "Problem 0", "hints": HINTS})
+        async with api() as client:
+            response = await client.post("/api/hint/batch", json={"problems": [_problem(i) for i in range(9)]})
+        return response
+
+    response = asyncio.run(scenario())
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[0]["id"] == "batch-0" and lines[0]["cached"]
+    assert sorted(line["id"] for line in lines[:-1]) == [f"batch-{i}" for i in range(9)]
+    assert all(line["hint"] == {"1": "a", "2": "b", "3": "c", "4": "d"} for line in lines[:-1])
+    assert lines[-1] == {"done": True, "problems": 9, "cached": 1, "failed": 0}
+    # 8 misses in two groups of four, plus one single call per problem a group left out
+    assert sorted({kind for kind, _ in calls}) == ["group", "single"]
+    assert len({tuple(ids) for kind, ids in calls if kind == "group"}) == 2
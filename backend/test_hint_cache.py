@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from app.services.hint_cache import HintCache, LRUCache, SQLBackend
+
+
+def test_lru_evicts_least_recently_used_and_expired():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.get("a")
+    lru.set("c", 3)
+    assert lru.get("b") is None and lru.get("a") == 1 and lru.get("c") == 3
+    lru.set("old", 4, expires_at=time.time() - 1)
+    assert lru.get("old") is None
+
+
+def test_backend_hits_keep_the_rows_expiry(tmp_path):
+    backend = SQLBackend(f"sqlite:///{tmp_path / 'hints.db'}")
+    soon = time.time() + 60
+    backend.set("k", {"hint": "x"}, soon)
+    cache = HintCache(backend=backend, ttl=30 * 24 * 3600)
+
+    async def scenario():
+        polled = await cache.get("k", record=False)
+        value = await cache.get("k")
+        missing = await cache.get("other")
+        return polled, value, missing
+
+    polled, value, missing = asyncio.run(scenario())
+    assert polled == value == {"hint": "x"} and missing is None
+    assert cache.lru._data["k"][1] == soon
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_sql_eviction_drops_expired_then_least_recently_used(tmp_path):
+    backend = SQLBackend(f"sqlite:///{tmp_path / 'hints.db'}", max_rows=2)
+    backend.set("expired", 0, time.time() - 1)
+    for key in ("a", "b", "c"):
+        backend.set(key, key)
+        time.sleep(0.01)
+    backend.get("a")
+    backend.evict()
+    assert backend.get("expired") is None and backend.get("b") is None
+    assert backend.get("a") == ("a", None) and backend.get("c") == ("c", None)
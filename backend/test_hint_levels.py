@@ -0,0 +1,119 @@
+import asyncio
+import json
+import re
+
+from app import main
+
+PROBLEM = {"title": "Two Sum", "difficulty": "Easy", "description": "desc", "id": "levels-1"}
+HINTS = {"1": "think", "2": "hash map", "3": "one pass", "4": "store index"}
+
+
+def level_responder(prompts):
+    def respond(messages):
+        prompt = messages[-1].content
+        prompts.append(prompt)
+        levels = re.search(r"levels ([\d, ]+)", prompt).group(1).replace(" ", "").split(",")
+        return json.dumps({"hints": {level: HINTS[level] for level in levels}})
+
+    return respond
+
+
+def problem():
+    return main.ProblemData(**PROBLEM)
+
+
+async def request_level(api, level, mode="level"):
+    async with api() as client:
+        return await client.post("/api/hint", json={"problem_data": PROBLEM, "hint_level": level, "mode": mode})
+
+
+def test_only_the_missing_level_is_generated_after_the_cached_ones(monkeypatch, api, fake_models):
+    prompts = []
+    fake_models(responder=level_responder(prompts))
+    monkeypatch.setattr(main, "HINT_PREFETCH", False)
+
+    async def scenario():
+        for level in (1, 2):
+            await main.hint_cache.set(main.hint_level_key(problem(), level), {"hint": HINTS[str(level)]})
+        return await request_level(api, 3)
+
+    response = asyncio.run(scenario())
+    assert response.json()["hint"] == {"1": "think", "2": "hash map", "3": "one pass"}
+    assert len(prompts) == 1
+    assert '"1": "think"' in prompts[0] and "levels 3" in prompts[0]
+
+
+def test_next_level_is_prefetched_and_drained_on_shutdown(monkeypatch, api, fake_models):
+    prompts = []
+    fake_models(responder=level_responder(prompts), latency=0.05)
+    monkeypatch.setattr(main, "HINT_PREFETCH", True)
+
+    async def scenario():
+        response = await request_level(api, 1)
+        await main.drain_prefetches(5)
+        return response, await main.hint_cache.get(main.hint_level_key(problem(), 2))
+
+    response, prefetched = asyncio.run(scenario())
+    assert response.json()["hint"] == {"1": "think"}
+    assert prefetched == {"hint": "hash map"}
+    assert not main._prefetch_tasks
+
+
+def test_drain_cancels_prefetches_past_the_timeout(monkeypatch, api, fake_models):
+    fake_models(responder=level_responder([]), latency=5)
+    monkeypatch.setattr(main, "HINT_PREFETCH", True)
+
+    async def scenario():
+        main.prefetch_level(problem(), 2)
+        tasks = set(main._prefetch_tasks)
+        await main.drain_prefetches(0.05)
+        await asyncio.sleep(0)
+        return tasks
+
+    assert all(task.cancelled() for task in asyncio.run(scenario()))
+
+
+def test_full_hints_short_circuit_level_mode(monkeypatch, api):
+    def no_model(*args, **kwargs):
+        raise AssertionError("cached hints must not call the model")
+
+    monkeypatch.setattr(main.models, "get", no_model)
+    monkeypatch.setattr(main, "HINT_PREFETCH", False)
+
+    async def scenario():
+        await main.hint_cache.set(main.hint_cache_key(problem()), {"problem_title": "Two Sum", "hints": HINTS})
+        return [await request_level(api, 2), await request_level(api, 5, mode="all"), await request_level(api, 5)]
+
+    level, all_levels, invalid = asyncio.run(scenario())
+    assert level.json()["hint"] == {"1": "think", "2": "hash map"}
+    assert all_levels.status_code == 200 and len(all_levels.json()["hint"]) == 4
+    assert invalid.status_code == 422
+
+
+def test_level_mode_streams_only_the_requested_levels(monkeypatch, api, fake_models):
+    prompts = []
+    fake_models(responder=level_responder(prompts))
+    monkeypatch.setattr(main, "HINT_PREFETCH", False)
+
+    async def scenario():
+        async with api() as client:
+            return await client.post("/api/hint/stream", json={"problem_data": PROBLEM, "hint_level": 2, "mode": "level"})
+
+    body = asyncio.run(scenario()).text
+    assert body.count("event: hint") == 2 and "store index" not in body and "event: done" in body
+    assert len(prompts) == 1 and "levels 1, 2" in prompts[0]
+
+
+def test_a_level_request_counts_one_cache_lookup(monkeypatch, api, fake_models):
+    fake_models(responder=level_responder([]))
+    monkeypatch.setattr(main, "HINT_PREFETCH", True)
+
+    async def scenario():
+        counts = []
+        for _ in range(2):
+            await request_level(api, 1)
+            await main.drain_prefetches(5)
+            counts.append((main.hint_cache.hits, main.hint_cache.misses))
+        return counts
+
+    assert asyncio.run(scenario()) == [(0, 1), (1, 1)]
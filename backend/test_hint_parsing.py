@@ -0,0 +1,42 @@
+import pytest
+
+from app.services.hint_parsing import HintParseError, missing_levels, parse_hints
+
+HINTS = '{"problem_title": "Two Sum", "hints": {"1": "one", "2": "two", "3": "three", "4": "four"}}'
+
+
+def test_strict_json_is_not_repaired():
+    title, hints, repaired = parse_hints(HINTS)
+    assert title == "Two Sum"
+    assert hints == {1: "one", 2: "two", 3: "three", 4: "four"}
+    assert not repaired
+
+
+@pytest.mark.parametrize("text", [
+    f"```json\n{HINTS}\n```",
+    f"Here are your hints:\n{HINTS}\nGood luck!",
+    HINTS.replace('"four"}', '"four",}'),
+])
+def test_common_defects_are_repaired(text):
+    _, hints, repaired = parse_hints(text)
+    assert hints == {1: "one", 2: "two", 3: "three", 4: "four"}
+    assert repaired
+
+
+def test_key_styles_are_normalised():
+    _, hints, _ = parse_hints('{"hints": {"level_1": "one", "2": "two", "level 3": "three"}}')
+    assert hints == {1: "one", 2: "two", 3: "three"}
+    _, hints, _ = parse_hints('{"hints": ["one", "two"]}')
+    assert hints == {1: "one", 2: "two"}
+
+
+def test_truncated_answer_keeps_complete_levels():
+    title, hints, _ = parse_hints('{"problem_title": "Two Sum", "hints": {"1": "one", "2": "two", "3": "thr')
+    assert title == "Two Sum"
+    assert hints == {1: "one", 2: "two"}
+    assert missing_levels(hints) == [3, 4]
+
+
+def test_no_levels_raises():
+    with pytest.raises(HintParseError):
+        parse_hints("Sorry, I can't help with that.")
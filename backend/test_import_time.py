@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+
+# provider SDKs and the hint cache's SQLAlchemy backend are loaded on warm-up, never by the app module
+LAZY_MODULES = ["langchain_groq", "langchain_google_genai", "groq", "google.ai.generativelanguage", "langchain.chains",
+                "sqlalchemy"]
+# about 1.5x the measured import of app.main (~1.3s); the eager app took ~1.7s
+BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "2000"))
+# what the app module used to import up front, as a baseline measured on the same machine
+EAGER_IMPORTS = "fastapi, langchain_core.prompts, langchain_groq, langchain_google_genai, groq, langchain.schema.runnable"
+
+
+def run(*args):
+    # measured on the default configuration
+    env = {k: v for k, v in os.environ.items() if k not in ("HINT_CACHE_URL", "SHARED_STATE_URL")}
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def import_ms(modules):
+    code = f"import time; start = time.perf_counter(); import {modules}; print((time.perf_counter() - start) * 1000)"
+    return min(float(run("-W", "ignore", "-c", code).stdout) for _ in range(2))
+
+
+def import_times():
+    result = run("-X", "importtime", "-c", "import app.main")
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def test_app_import_is_slim():
+    times = import_times()
+    assert not [m for m in LAZY_MODULES if m in times]
+    app, eager = import_ms("app.main"), import_ms(EAGER_IMPORTS)
+    assert app < BUDGET_MS, f"import app.main took {app:.0f}ms"
+    assert app < eager, f"import app.main took {app:.0f}ms, the eager provider imports {eager:.0f}ms"
@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.services.model_registry import ModelRegistry
+from app.services.replay import ReplayLog
+
+
+def test_request_during_warm_up_does_not_block_the_event_loop(monkeypatch):
+    registry = ModelRegistry(replay=ReplayLog())
+    builds = []
+
+    def slow_build(provider, model, params):
+        builds.append(model)
+        time.sleep(0.3)  # an SDK import
+        return object()
+
+    monkeypatch.setattr(registry, "_build", slow_build)
+    warm = threading.Thread(target=registry.warm, args=([("groq", "m", {})],))
+
+    async def scenario():
+        warm.start()
+        await asyncio.sleep(0.05)
+        ticks = []
+
+        async def tick():
+            while True:
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.01)
+
+        ticker = asyncio.create_task(tick())
+        model = await registry.aget("groq", "m")
+        ticker.cancel()
+        return model, max(b - a for a, b in zip(ticks, ticks[1:]))
+
+    model, longest_gap = asyncio.run(scenario())
+    warm.join()
+    assert model is registry.get("groq", "m") and builds == ["m"]
+    assert longest_gap < 0.1
+
+
+def test_failed_groq_build_closes_both_http_clients(monkeypatch):
+    monkeypatch.delenv("GROQ_API_KEY", raising=False)
+    closed = []
+
+    class Client(httpx.Client):
+        def close(self):
+            closed.append("sync")
+            super().close()
+
+    class AsyncClient(httpx.AsyncClient):
+        async def aclose(self):
+            closed.append("async")
+            await super().aclose()
+
+    monkeypatch.setattr(httpx, "Client", Client)
+    monkeypatch.setattr(httpx, "AsyncClient", AsyncClient)
+    registry = ModelRegistry(replay=ReplayLog())
+    with pytest.raises(Exception):
+        registry._build("groq", "llama-3.1-8b-instant", {})
+    assert sorted(closed) == ["async", "sync"] and not registry._clients
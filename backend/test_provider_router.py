@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+from langchain_core.outputs import ChatGenerationChunk
+
+from app.services.provider_router import HealthBoard, ProviderRouter
+from bench.fake_llm import FakeChatModel
+
+ROUTES = [("fake", "a", {}), ("fake", "b", {})]
+
+
+class Registry:
+    """Serves a fixed model per route and records which routes were called."""
+
+    def __init__(self, **models):
+        self.models = models
+        self.calls = []
+
+    def get(self, provider, model, **params):
+        self.calls.append(model)
+        return self.models[model]
+
+    async def aget(self, provider, model, **params):
+        return self.get(provider, model, **params)
+
+
+class Switch:
+    """A responder that fails while ``down`` is set."""
+
+    def __init__(self, text, down=False):
+        self.text = text
+        self.down = down
+
+    def __call__(self, messages):
+        if self.down:
+            raise RuntimeError(f"{self.text} down")
+        return self.text
+
+
+class StreamsThenFails(FakeChatModel):
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        yield ChatGenerationChunk(message=AIMessageChunk(content="partial"))
+        raise RuntimeError("connection reset")
+
+
+def router(registry, board=None, **kwargs):
+    return ProviderRouter(registry, ROUTES, board or HealthBoard(failure_threshold=1, reset_timeout=0.05), **kwargs)
+
+
+def fake(switch, latency=0):
+    return FakeChatModel(responder=switch, latency=latency)
+
+
+def test_failure_fails_over_to_the_next_provider():
+    registry = Registry(a=fake(Switch("a", down=True)), b=fake(Switch("b")))
+    answer = asyncio.run(router(registry).ainvoke("hi"))
+    assert answer.content == "b" and registry.calls == ["a", "b"]
+
+
+def test_breaker_opens_half_opens_and_closes():
+    a = Switch("a", down=True)
+    registry = Registry(a=fake(a), b=fake(Switch("b")))
+    r = router(registry)
+    asyncio.run(r.ainvoke("hi"))
+    assert r.board["fake:a"].state == "open"
+    registry.calls.clear()
+    assert asyncio.run(r.ainvoke("hi")).content == "b" and registry.calls == ["b"]
+
+    time.sleep(0.06)
+    a.down = False
+    registry.calls.clear()
+    assert asyncio.run(r.ainvoke("hi")).content == "a" and registry.calls == ["a"]
+    assert r.board["fake:a"].state == "closed"
+
+
+def test_unused_backup_keeps_its_half_open_trial():
+    a, b = Switch("a"), Switch("b", down=True)
+    r = router(Registry(a=fake(a), b=fake(b)))
+    # open b's breaker, then let it recover while a keeps answering
+    with pytest.raises(RuntimeError):
+        asyncio.run(ProviderRouter(r.registry, [ROUTES[1]], r.board).ainvoke("hi"))
+    b.down = False
+    time.sleep(0.06)
+    assert asyncio.run(r.ainvoke("hi")).content == "a"
+    assert r.board["fake:b"].can_try()
+    a.down = True
+    assert asyncio.run(r.ainvoke("hi")).content == "b"
+    assert r.board["fake:b"].state == "closed"
+
+
+def test_slow_primary_is_hedged():
+    registry = Registry(a=fake(Switch("a"), latency=0.5), b=fake(Switch("b")))
+    r = router(registry, hedge=True, hedge_min_delay=0.0, hedge_default_delay=0.05)
+    start = time.perf_counter()
+    assert asyncio.run(r.ainvoke("hi")).content == "b"
+    assert time.perf_counter() - start < 0.4 and r.hedges == 1
+
+
+def test_stream_fails_over_only_before_the_first_token():
+    async def collect(r):
+        return [chunk.content async for chunk in r.astream("hi")]
+
+    before = Registry(a=fake(Switch("a", down=True)), b=fake(Switch("b")))
+    assert asyncio.run(collect(router(before))) == ["b"]
+
+    after = Registry(a=StreamsThenFails(), b=fake(Switch("b")))
+    with pytest.raises(RuntimeError, match="connection reset"):
+        asyncio.run(collect(router(after)))
+    assert after.calls == ["a"]
@@ -0,0 +1,61 @@
+import asyncio
+import gzip
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from app.services.replay import ReplayedError, ReplayLog, ReplayMiss, redact
+from bench.fake_llm import FakeChatModel
+
+SECRET = "gsk_" + "a1" * 16
+PROMPT = [SystemMessage(content="You are a tutor."), HumanMessage(content=f"Why? my key is {SECRET}")]
+STREAMED = [SystemMessage(content="You are a tutor."), HumanMessage(content="Explain two sum")]
+
+
+def unbuildable():
+    raise AssertionError("replay must not build a provider client")
+
+
+def test_record_then_replay_without_the_provider(tmp_path):
+    path = str(tmp_path / "calls.jsonl.gz")
+    recorder = ReplayLog(path, mode="record")
+    inner = FakeChatModel(text=f"Use a hash map to find the complement, not {SECRET}.", latency=0.1)
+    model = recorder.model("groq", "llama-3.1-8b-instant", {"api_key": SECRET, "max_tokens": 50}, lambda: inner)
+    answer = model.invoke(PROMPT)
+
+    async def stream(m):
+        return [chunk.content async for chunk in m.astream(STREAMED)]
+
+    streamed = asyncio.run(stream(model))
+    recorder.close()
+    raw = gzip.open(path, "rt").read()
+    assert SECRET not in raw and "[REDACTED]" in raw and '"max_tokens":50' in raw
+
+    replayer = ReplayLog(path, mode="replay", speed=1)
+    replayed = replayer.model("groq", "llama-3.1-8b-instant", {}, unbuildable)
+    start = time.perf_counter()
+    assert replayed.invoke(PROMPT).content == answer.content.replace(SECRET, "[REDACTED]")
+    assert time.perf_counter() - start >= 0.09
+    replayer.speed = 0
+    assert asyncio.run(stream(replayed)) == [redact(text) for text in streamed]
+    with pytest.raises(ReplayMiss):
+        replayed.invoke([HumanMessage(content="never recorded")])
+    assert replayer.snapshot() == {"mode": "replay", "recorded": 0, "replayed": 2, "misses": 1}
+
+
+def test_recorded_errors_are_replayed(tmp_path):
+    path = str(tmp_path / "calls.jsonl")
+    recorder = ReplayLog(path, mode="record")
+
+    def fail(messages):
+        raise RuntimeError("429 rate limited")
+
+    model = recorder.model("google", "gemini-1.5-flash", {}, lambda: FakeChatModel(responder=fail, latency=0))
+    with pytest.raises(RuntimeError):
+        model.invoke(PROMPT)
+    recorder.close()
+
+    replayed = ReplayLog(path, mode="replay", speed=0).model("google", "gemini-1.5-flash", {}, unbuildable)
+    with pytest.raises(ReplayedError, match="429 rate limited"):
+        replayed.invoke(PROMPT)
@@ -0,0 +1,38 @@
+import time
+
+from app.services.semantic_cache import SemanticCache
+from bench.semantic_threshold import DIFFERENT, SAME, similarity
+
+
+def test_default_threshold_separates_the_labelled_pairs():
+    threshold = SemanticCache().threshold
+    assert all(similarity(a, b) >= threshold for a, b in SAME)
+    assert all(similarity(a, b) < threshold for a, b in DIFFERENT)
+
+
+def test_paraphrase_hits_and_different_question_misses():
+    cache = SemanticCache()
+    cache.set("two-sum", "What is the time complexity?", "O(n)")
+    assert cache.get("two-sum", "whats the time complexity") == "O(n)"
+    assert cache.get("two-sum", "What is the space complexity?") is None
+    assert cache.get("three-sum", "What is the time complexity?") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_expired_entries_miss():
+    cache = SemanticCache(ttl=0.05)
+    cache.set("p", "How does a hash map work?", "hashing")
+    time.sleep(0.06)
+    assert cache.get("p", "How does a hash map work?") is None
+
+
+def test_eviction_per_problem_and_across_problems():
+    cache = SemanticCache(max_problems=2, max_per_problem=10)
+    for i in range(11):
+        cache.set("p", f"question number {i} about arrays", str(i))
+    assert len(cache) == 10 and cache.get("p", "question number 0 about arrays") != "0"
+    cache.set("q", "How does a heap work?", "heap")
+    cache.get("p", "question number 5 about arrays")
+    cache.set("r", "What is a trie?", "trie")
+    assert cache.get("q", "How does a heap work?") is None
+    assert cache.get("p", "question number 5 about arrays") == "5"
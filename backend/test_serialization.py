@@ -0,0 +1,60 @@
+import asyncio
+
+from app import main
+from app.services.serialization import etag, etag_matches
+
+PROBLEM = {"title": "Two Sum", "difficulty": "Easy", "description": "desc", "id": "etag-1"}
+
+
+def _post_all(api, requests):
+    async def scenario():
+        async with api() as client:
+            return [await client.request(method, path, **kwargs) for method, path, kwargs in requests]
+
+    return asyncio.run(scenario())
+
+
+def test_etag_weak_comparison():
+    tag = etag({"hint": {1: "a"}})
+    assert tag.startswith('W/"')
+    assert etag_matches(tag.removeprefix("W/"), tag)
+    assert etag_matches(f'"other", {tag}', tag)
+    assert not etag_matches('"other"', tag) and not etag_matches(None, tag)
+
+
+def test_unchanged_hints_revalidate_with_304(api):
+    key = main.hint_cache_key(main.ProblemData(**PROBLEM))
+    asyncio.run(main.hint_cache.set(key, {"problem_title": "Two Sum", "hints": {"1": "a", "2": "b", "3": "c", "4": "d"}}))
+
+    first, = _post_all(api, [("POST", "/api/hint", {"json": {"problem_data": PROBLEM}, "headers": {"If-None-Match": "*"}})])
+    tag, location = first.headers["ETag"], first.headers["Content-Location"]
+    fetched, again, missing = _post_all(api, [
+        ("GET", location, {}),
+        ("GET", location, {"headers": {"If-None-Match": tag}}),
+        ("GET", "/api/hint/cached/unknown", {"headers": {"If-None-Match": tag}}),
+    ])
+    # conditional headers on the POST are not evaluated; it always answers with the hints
+    assert first.status_code == 200 and first.json()["hint"]["1"] == "a"
+    assert fetched.status_code == 200 and fetched.headers["ETag"] == tag and fetched.json()["hint"] == first.json()["hint"]
+    assert again.status_code == 304 and again.content == b""
+    assert missing.status_code == 404
+
+    asyncio.run(main.hint_cache.set(key, {"problem_title": "Two Sum", "hints": {"1": "A", "2": "b", "3": "c", "4": "d"}}))
+    changed, = _post_all(api, [("GET", location, {"headers": {"If-None-Match": tag}})])
+    assert changed.status_code == 200 and changed.headers["ETag"] != tag
+
+
+def test_large_responses_are_compressed_but_streams_are_not(api, fake_models):
+    fake_models(text=" ".join(["word"] * 400))
+    chat = [{"sender": "ai", "text": "Hi!", "id": 1, "timestamp": "2024-01-01T00:00:00Z"},
+            {"sender": "user", "text": "What is a hash map?"}]
+    headers = {"Accept-Encoding": "gzip"}
+    answer, stream, invalid = _post_all(api, [
+        ("POST", "/api/explain", {"json": {"chat": chat, "problem": "Two Sum"}, "headers": headers}),
+        ("POST", "/api/explain/stream", {"json": {"chat": chat, "problem": "Two Sum"}, "headers": headers}),
+        ("POST", "/api/explain", {"json": {"chat": [{"sender": "bot", "text": "?"}], "problem": "Two Sum"}}),
+    ])
+    assert answer.headers["content-encoding"] == "gzip"
+    assert answer.json()["explanation"].startswith("word word")
+    assert "content-encoding" not in stream.headers
+    assert invalid.status_code == 422
@@ -0,0 +1,58 @@
+import asyncio
+
+from app import main
+from app.services.session_store import ChatSession
+
+PROBLEM = "Two Sum: return indices of the two numbers adding up to target."
+
+
+def test_session_create_continue_and_unknown(api, fake_models):
+    prompts = []
+
+    def respond(messages):
+        prompts.append([str(m.content) for m in messages])
+        return "Use a hash map."
+
+    fake_models(responder=respond)
+
+    async def scenario():
+        async with api() as client:
+            first = await client.post("/api/explain", json={"message": "How do I start?", "problem": PROBLEM})
+            session_id = first.json()["session_id"]
+            second = await client.post("/api/explain", json={"message": "And then?", "session_id": session_id})
+            unknown = await client.post("/api/explain", json={"message": "Hello?", "session_id": "missing"})
+        return first, second, unknown, await main.sessions.get(session_id)
+
+    first, second, unknown, session = asyncio.run(scenario())
+    assert first.status_code == second.status_code == 200
+    assert second.json()["session_id"] == first.json()["session_id"]
+    assert "How do I start?" in prompts[-1] and "Use a hash map." in prompts[-1]
+    assert unknown.status_code == 404
+    assert [sender for sender, _ in session.messages] == ["user", "ai", "user", "ai"]
+
+
+def test_malformed_requests_get_422(api):
+    async def scenario():
+        async with api() as client:
+            return [(await client.post("/api/explain", json=body)).status_code for body in [
+                {},
+                {"chat": [{"sender": "user", "text": "hi"}]},
+                {"problem": PROBLEM},
+                {"problem": PROBLEM, "chat": [{"sender": "system", "text": "context"}]},
+                {"message": "hi"},
+            ]]
+
+    assert asyncio.run(scenario()) == [422] * 5
+
+
+def test_history_window_folds_old_turns_into_a_summary():
+    session = ChatSession("s", PROBLEM)
+    for i in range(6):
+        session.add("user", f"Question {i}. " + "word " * 40)
+        session.add("ai", f"Answer {i}. " + "word " * 40)
+    session.mark_analyzed("code")
+    history = session.history(token_budget=200)
+    assert history[0].type == "system" and "User: Question 0." in history[0].content
+    assert len(session.messages) < 12 and session.messages[-1][1].startswith("Answer 5.")
+    assert [m.content for m in history[1:]] == [text for _, text in session.messages]
+    assert session.analyzed_index == len(session.messages) - 1
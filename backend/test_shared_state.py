@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.services.session_store import SessionStore
+from app.services.shared_state import MemoryTable, RedisTable, SharedState
+
+
+def redis_table():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # Lua scripting for the token bucket
+    return RedisTable(fakeredis.aioredis.FakeRedis(), "test:")
+
+
+@pytest.fixture(params=["memory", "redis"])
+def table(request):
+    return MemoryTable() if request.param == "memory" else redis_table()
+
+
+def test_table_round_trip_and_expiry(table):
+    async def scenario():
+        await table.set("a", {"x": [1, 2]})
+        await table.set("b", "short-lived", ttl=1)
+        found = await table.get("a"), await table.get("missing")
+        await asyncio.sleep(1.1)
+        expired = await table.get("b")
+        await table.delete("a")
+        return found, expired, await table.get("a")
+
+    (a, missing), expired, deleted = asyncio.run(scenario())
+    assert a == {"x": [1, 2]}
+    assert missing is None and expired is None and deleted is None
+
+
+def test_token_bucket_take(table):
+    async def scenario():
+        return [await table.take("client", 0.5, 2) for _ in range(3)]
+
+    first, second, third = asyncio.run(scenario())
+    assert first == 0 and second == 0
+    assert 0 < third <= 2
+
+
+def test_session_continues_on_another_worker():
+    state = SharedState()
+
+    async def scenario():
+        worker_a, worker_b = SessionStore(state), SessionStore(state)
+        session = worker_a.create("Two Sum", "def f(): pass")
+        session.problem_id = "1"
+        session.add("user", "hi")
+        session.add("ai", "hello")
+        await worker_a.save(session)
+        return await worker_b.get(session.id)
+
+    restored = asyncio.run(scenario())
+    assert restored.problem_id == "1"
+    assert restored.code == "def f(): pass"
+    assert restored.messages == [("user", "hi"), ("ai", "hello")]
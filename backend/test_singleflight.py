@@ -0,0 +1,129 @@
+import asyncio
+import json
+
+import pytest
+
+from app.services.singleflight import SingleFlight
+
+
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # Lua scripting for the lock release
+    return fakeredis.aioredis.FakeRedis()
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "hints"
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("k", fn) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == ["hints"] * 5
+    assert len(calls) == 1 and (flight.leaders, flight.shared) == (1, 4)
+    assert not flight.in_flight("k")
+
+
+def test_leader_error_reaches_every_follower():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("provider down")
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+        retried = await flight.do("k", lambda: asyncio.sleep(0, result="ok"))
+        return results, retried
+
+    results, retried = asyncio.run(scenario())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert retried == "ok"
+
+
+def test_other_worker_waits_for_the_published_result():
+    client = fake_redis()
+    leader, follower = SingleFlight(client=client, poll_interval=0.01), SingleFlight(client=client, poll_interval=0.01)
+    published, calls = {}, []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        published["k"] = "hints"
+        return "hints"
+
+    async def check():
+        return published.get("k")
+
+    async def scenario():
+        first = asyncio.create_task(leader.do("k", compute, check=check))
+        await asyncio.sleep(0.02)
+        second = await follower.do("k", compute, check=check)
+        return await first, second, await client.exists("singleflight:k")
+
+    assert asyncio.run(scenario()) == ("hints", "hints", 0)
+    assert len(calls) == 1 and follower.shared == 1
+
+
+def test_follower_computes_when_the_lock_goes_without_a_result():
+    client = fake_redis()
+    flight = SingleFlight(client=client, poll_interval=0.01)
+
+    async def check():
+        return None
+
+    async def scenario():
+        await client.set("singleflight:k", "other-worker", ex=1)
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.05, lambda: asyncio.ensure_future(client.delete("singleflight:k")))
+        return await flight.do("k", lambda: asyncio.sleep(0, result="mine"), check=check)
+
+    assert asyncio.run(scenario()) == "mine"
+    assert flight.leaders == 1
+
+
+def test_release_leaves_another_workers_lock():
+    client = fake_redis()
+    flight = SingleFlight(client=client)
+
+    async def scenario():
+        await client.set("singleflight:k", "their-token")
+        await flight._release("singleflight:k", "my-token")
+        kept = await client.get("singleflight:k")
+        await flight._release("singleflight:k", "their-token")
+        return kept, await client.get("singleflight:k")
+
+    assert asyncio.run(scenario()) == (b"their-token", None)
+
+
+def test_concurrent_hint_streams_share_one_generation(api, fake_models):
+    from app import main
+
+    calls = []
+
+    def respond(messages):
+        calls.append(1)
+        return json.dumps({"problem_title": "Two Sum", "hints": {"1": "a", "2": "b", "3": "c", "4": "d"}})
+
+    fake_models(responder=respond, latency=0.1)
+    problem = {"title": "Two Sum", "difficulty": "Easy", "description": "desc", "id": "flight-stream"}
+
+    shared = main.hint_flight.shared
+
+    async def scenario():
+        async with api() as client:
+            streams = await asyncio.gather(*(client.post("/api/hint/stream", json={"problem_data": problem}) for _ in range(5)))
+            return streams, await client.post("/api/hint", json={"problem_data": problem})
+
+    streams, cached = asyncio.run(scenario())
+    assert len(calls) == 1 and main.hint_flight.shared - shared == 4
+    assert cached.status_code == 200 and cached.json()["hint"]["4"] == "d"
+    for response in streams:
+        events = [line.removeprefix("event: ") for line in response.text.splitlines() if line.startswith("event: ")]
+        assert events == ["hint"] * 4 + ["done"]
+        assert '"hint":"d"' in response.text.replace(" ", "")
@@ -0,0 +1,54 @@
+import asyncio
+
+from langchain_core.messages import AIMessage
+
+from app import main
+from app.services.tiering import TieringPolicy
+from bench.fake_llm import FakeChatModel
+
+CODE = "def two_sum(nums, target):\n    return []"
+
+
+def test_policy_picks_tier_and_cap():
+    policy = TieringPolicy({"explain": main.explain_model, "hint": main.hint_model})
+    assert policy.explain_tier({"question": "thanks!", "chat_history": []}, needs_code=False) == ("chat_small", None)
+    long_history = {"question": "why?", "chat_history": [AIMessage(content="x")] * 12, "code": CODE}
+    assert policy.explain_tier(long_history, needs_code=True) == ("code_deep", None)
+    assert policy.hint_tier("Easy") == ("hint", 1200) and policy.hint_tier("Hard") == ("hint_hard", None)
+    assert policy.level_tier([1], "Medium") == ("hint_level", 300)
+    assert policy.level_tier([1, 2, 3, 4], "Hard") == ("hint_level", 1600)
+    assert policy.router("code_deep").router.routes[0][1] == "gemini-2.5-flash"
+    assert policy.router("hint_hard").router.routes[0][2]["thinking_budget"] == 0
+    assert policy.models("hint_hard").startswith("google:gemini-2.5-flash,")
+    thinking = TieringPolicy({"explain": main.explain_model, "hint": main.hint_model}, thinking_budget=512)
+    assert thinking.router("code_deep").router.routes[0][2]["max_output_tokens"] == 1200 + 512
+    assert "thinking_budget" not in thinking.router("code_deep").router.routes[-1][2]
+
+    easy, hard = (main.ProblemData(title="T", difficulty=d, description="d", id="1") for d in ("Easy", "Hard"))
+    assert main.hint_cache_key(easy) != main.hint_cache_key(hard)
+
+    disabled = TieringPolicy({"explain": main.explain_model, "hint": main.hint_model}, enabled=False)
+    assert disabled.explain_tier(long_history, needs_code=True) == ("explain", None)
+    assert disabled.router("hint").router is main.hint_model
+
+
+def test_short_turn_streams_from_the_small_tier(monkeypatch, api):
+    calls = []
+
+    def get(provider, model, **params):
+        calls.append((model, params.get("max_tokens") or params.get("max_output_tokens")))
+        return FakeChatModel(text="Glad it helped.", latency=0)
+
+    monkeypatch.setattr(main.models, "get", get)
+    before = main.tiering.snapshot().get("chat_small", {}).get("requests", 0)
+
+    async def scenario():
+        async with api() as client:
+            return await client.post("/api/explain/stream", json={
+                "message": "tiering test: great, thanks a lot", "problem": "Two Sum", "code": ""})
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert "Glad" in response.text
+    assert calls[0] == ("llama-3.1-8b-instant", 250)
+    assert main.tiering.snapshot()["chat_small"]["requests"] == before + 1
@@ -1,5 +1,7 @@
-import React, { useEffect, useState } from 'react';
+import React, { useEffect, useRef, useState } from 'react';
 import ReactMarkdown from 'react-markdown';
+import { readEventStream } from '../utils/readEventStream';
+import { codeFields } from '../utils/codeDelta';
 import { ChevronDown, ChevronRight, Book, Code, List, Settings, MessageCircle, Send, X, Minimize2 } from 'lucide-react';
 
 // Copper aquamarine dream color palette
@@ -19,6 +21,18 @@ const HINT_LEVELS = {
   "4": { label: "Implementation & Edge Cases", icon: Settings, color: COLORS.warm }
 };
 
+// stable per-install id the backend rate-limits on
+const getClientId = () => {
+  let id = localStorage.getItem('clientId');
+  if (!id) {
+    id = crypto.randomUUID();
+    localStorage.setItem('clientId', id);
+  }
+  return id;
+};
+
+const API_HEADERS = { 'Content-Type': 'application/json', 'X-Client-Id': getClientId() };
+
 
 
 const ChatWindow = ({ isOpen, onClose, onMinimize, problem,code }) => {
@@ -34,6 +48,9 @@ const ChatWindow = ({ isOpen, onClose, onMinimize, problem,code }) => {
     { id:1, text:`Hi! I'm here to help you. What would you like to discuss about this problem?`, sender:'ai', timestamp:new Date() }
   ];
   const [messages, setMessages] = useState(defaultMessages);
+  const [sessionId, setSessionId] = useState(null);
+  // the code the server session holds, so later turns send only a hash or an edit
+  const sentCode = useRef({ sessionId: null, code: null });
 
   useEffect(() => {
     const saved = localStorage.getItem('leetcode_ai_chat');
@@ -43,6 +60,7 @@ const ChatWindow = ({ isOpen, onClose, onMinimize, problem,code }) => {
         const parsed = parsedobj.messages;
         if(parsedobj.problemid === problem.id) {
           setMessages(parsed.map(m => ({ ...m, timestamp: new Date(m.timestamp) })));
+          setSessionId(parsedobj.sessionId || null);
           return;
         }
       } catch (e) {
@@ -60,12 +78,14 @@ const ChatWindow = ({ isOpen, onClose, onMinimize, problem,code }) => {
   useEffect(() => {
     if(messages.length!=2)
     {
-      localStorage.setItem('leetcode_ai_chat', JSON.stringify({messages:messages,problemid:problem.id}));
+      localStorage.setItem('leetcode_ai_chat', JSON.stringify({messages:messages,problemid:problem.id,sessionId:sessionId}));
     }
-  }, [messages]);
+  }, [messages, sessionId]);
 
   const clearChat = () => {
     setMessages(defaultMessages);
+    setSessionId(null);
+    sentCode.current = { sessionId: null, code: null };
     localStorage.removeItem('leetcode_ai_chat');
   };
 
@@ -80,40 +100,50 @@ console.log('---code---',code);
       timestamp: new Date()
     };
      setInputText('');
-    const updatedMessages=[...messages,newMessage]
     setMessages(prev => [...prev, newMessage]);
      try {
-      let textadd=""
   const apiUrl = import.meta.env.VITE_API_URL;
-  const response = await fetch(`${apiUrl}/api/explain`, {
+  // only the new message goes up once the server holds the session;
+  // a new (or expired) session is seeded with the earlier turns
+  const post = (body) => fetch(`${apiUrl}/api/explain/stream`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-         chat:updatedMessages,
-         problem:problemdes,
-         code:code
-        })
+        headers: API_HEADERS,
+        body: JSON.stringify({ message: newMessage.text, problem_id: problem.id, ...body })
       });
+  const seed = { chat: messages, problem: problemdes, code: code };
+  const held = sentCode.current.sessionId === sessionId ? sentCode.current.code : null;
+  let response = await post(sessionId ? { session_id: sessionId, ...(await codeFields(held, code)) } : seed);
+  if (response.status === 409) {
+    // the session's code differs from what we last sent; send it in full
+    response = await post({ session_id: sessionId, code: code });
+  }
+  if (response.status === 404) {
+    setSessionId(null);
+    response = await post(seed);
+  }
       
       if (!response.ok) throw new Error('Failed to fetch hints');
-      const data = await response.json();
-      console.log("data", data);
 
-      if(!data.explanation||data.explanation==""||data.explanation==null){
+      const aiId = Date.now() + 1;
+      setMessages(prev => [...prev, { id: aiId, text: '', sender: 'ai', timestamp: new Date() }]);
+      const appendText = (text) =>
+        setMessages(prev => prev.map(m => m.id === aiId ? { ...m, text: m.text + text } : m));
+
+      let textadd=""
+      await readEventStream(response, (event, data) => {
+        if (event === 'token') {
+          textadd += data.text;
+          appendText(data.text);
+        } else if (event === 'done' && data.session_id) {
+          setSessionId(data.session_id);
+          sentCode.current = { sessionId: data.session_id, code: code ?? null };
+        }
+      });
+
+      if(!textadd){
         console.log("exmpty found in if");
-        
-        textadd="Sorry, I couldn't generate a response right now. Please try again, check your question, or reload the extension."
-      } else{
-        textadd=data.explanation
+        appendText("Sorry, I couldn't generate a response right now. Please try again, check your question, or reload the extension.");
       }
-
-       const aiResponse = {
-        id: Date.now() + 1,
-        text: textadd,
-        sender: 'ai',
-        timestamp: new Date() 
-      };
-      setMessages(prev => [...prev, aiResponse]);
       
     } catch (err) {
       setError('Could not fetch hints. Please try again.');
@@ -458,7 +488,8 @@ useEffect(()=>{
   };
 }
 
-  const fetchHints = async () => {
+  // hints are generated one level at a time; the server prefetches the next level
+  const fetchHintLevel = async (level) => {
     setLoading(true);
     setError('');
     
@@ -466,7 +497,7 @@ useEffect(()=>{
   const apiUrl = import.meta.env.VITE_API_URL;
   const response = await fetch(`${apiUrl}/api/hint`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers: API_HEADERS,
         body: JSON.stringify({
           problem_data: {
             title: problem.title,
@@ -474,21 +505,27 @@ useEffect(()=>{
             description: problem.description,
             id: problem.id
           },
-          hint_level: 1
+          hint_level: level,
+          mode: 'level'
         })
       });
       
       if (!response.ok) throw new Error('Failed to fetch hints');
       const data = await response.json();
-      console.log("data", data);
-      setHints(data.hint);
-      localStorage.setItem(`hints-${problem.id}`, JSON.stringify(data.hint));
+      setHints(prev => {
+        const received = { ...prev, ...data.hint };
+        localStorage.setItem(`hints-${problem.id}`, JSON.stringify(received));
+        return received;
+      });
+      setExpandedHints(prev => ({ ...prev, [level]: true }));
     } catch (err) {
       setError('Could not fetch hints. Please try again.');
     }
     setLoading(false);
   };
 
+  const fetchHints = () => fetchHintLevel(1);
+
   const getDifficultyColor = (difficulty) => {
     switch (difficulty?.toLowerCase()) {
       case 'easy': return COLORS.primary;
@@ -706,10 +743,10 @@ useEffect(()=>{
                     }}
                   >
                     <div
-                      onClick={() => hasHint && toggleHint(level)}
+                      onClick={() => hasHint ? toggleHint(level) : !loading && problem.id && fetchHintLevel(Number(level))}
                       style={{
                         padding: '16px',
-                        cursor: hasHint ? 'pointer' : 'default',
+                        cursor: hasHint || problem.id ? 'pointer' : 'default',
                         display: 'flex',
                         alignItems: 'center',
                         justifyContent: 'space-between',
@@ -750,7 +787,7 @@ useEffect(()=>{
                           opacity: 0.6,
                           fontStyle: 'italic'
                         }}>
-                          No hint available
+                          {problem.id ? 'Click to reveal' : 'No hint available'}
                         </span>
                       )}
                     </div>
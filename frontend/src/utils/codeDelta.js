@@ -0,0 +1,26 @@
+// Hex SHA-256 of the code, matching the backend's code_hash().
+export async function codeHash(code) {
+  const digest = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(code));
+  return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+}
+
+// The single line range that turns `base` into `code`: lines start..end of
+// base are replaced by `lines` (both split on '\n').
+export function lineEdit(base, code) {
+  const a = base.split('\n');
+  const b = code.split('\n');
+  let start = 0;
+  while (start < a.length && start < b.length && a[start] === b[start]) start++;
+  let tail = 0;
+  while (tail < a.length - start && tail < b.length - start && a[a.length - 1 - tail] === b[b.length - 1 - tail]) tail++;
+  return { start, end: a.length - tail, lines: b.slice(start, b.length - tail) };
+}
+
+// Code fields for an explain request in a server session: only a hash when
+// the code the session holds is unchanged, else a line edit against it.
+export async function codeFields(lastCode, code) {
+  if (lastCode === null || code == null) return { code };
+  const code_hash = await codeHash(code);
+  if (lastCode === code) return { code_hash };
+  return { code_hash, code_edit: { base_hash: await codeHash(lastCode), ...lineEdit(lastCode, code) } };
+}